@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+"""
+Benchmarks push and pull against the in-memory fake of the Google Sheets API.
+
+For every requested size, a synthetic gettext tree is generated and a series of push and pull
+scenarios is run against it. Each scenario reports its wall time, number of API requests,
+payload bytes and peak memory, e.g.:
+
+    python benchmark.py --entries 1000 10000 200000 --latency 0.05 --json results.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import fake_sheets
+import gettext2sheets
+
+SPREADSHEET_ID = 'benchmark'
+COLUMNS = [
+    {"static": "{file_name}", "header": "FILE"},
+    {"fields": ["msgctxt"], "header": "CONTEXT"},
+    {"fields": ["msgid"], "header": "MSGID (SINGULAR)"},
+    {"fields": ["msgstr", "msgstr[0]"], "header": "TRANSLATED (SINGULAR)"},
+    {"fields": ["msgid_plural"], "header": "MSGID (PLURAL)"},
+    {"fields": ["msgstr[1]"], "header": "TRANSLATED (PLURAL)"},
+    {"static": "{timestamp}", "header": "GENERATED AT"}
+]
+# As in the default config.json, some locales have no context column, so that rows are also
+# matched to entries that only differ in context
+COLUMNS_WITHOUT_CONTEXT = [column for column in COLUMNS if column["header"] != "CONTEXT"]
+TRANSLATED_HEADER = "TRANSLATED (SINGULAR)"
+
+def main():
+    args = handle_args()
+    results = []
+
+    for entries in args.entries:
+        with tempfile.TemporaryDirectory(prefix='gettext2sheets-benchmark-') as base:
+            results += benchmark_tree(Path(base), entries, args)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+def handle_args():
+    """Handles command-line parameters."""
+    parser = argparse.ArgumentParser(description='Benchmark gettext2sheets against a fake API.')
+    parser.add_argument('--entries', type=int, nargs='+', default=[1000, 10000, 50000, 200000],
+                        help='Total number of entries in each generated tree.')
+    parser.add_argument('--locales', type=int, default=4)
+    parser.add_argument('--files', type=int, default=10, help='Number of .po files per locale.')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated round trip time of each request, in seconds.')
+    parser.add_argument('--failure-rate', type=float, default=0,
+                        help='Fraction of requests that fail with a retryable error.')
+    parser.add_argument('--requests-per-minute', type=int, default=0,
+                        help='Request quota to stay within. Zero, the default, means no limit.')
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--parse-jobs', type=int, default=1,
+                        help='Number of processes that parse files during push.')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--mo', action='store_true',
+                        help='Makes pull write .mo files, and checks that every message can be '
+                             'looked up in them as libintl does.')
+    parser.add_argument('--json', help='Writes the results to this file as JSON.')
+    return parser.parse_args()
+
+def benchmark_tree(base, entries, args):
+    """Generates a tree with `entries` entries in total and runs every scenario against it."""
+    # Locale names may only contain letters and dashes
+    locales = ["x-{0}".format(gettext2sheets.get_column_string(i + 1).lower())
+               for i in range(args.locales)]
+    generate_tree(base / "gettext", locales, args.files, entries // (args.locales * args.files))
+
+    service = fake_sheets.FakeSheetsService(latency=args.latency, failure_rate=args.failure_rate)
+    configure(base, locales, service, args)
+    file_list = gettext2sheets.find_files(gettext2sheets.CONFIG["path"], ".po")
+
+    scenarios = [
+        ("push (full)", lambda: gettext2sheets.handle_push(service, file_list)),
+        ("push (unchanged)", lambda: gettext2sheets.handle_push(service, file_list)),
+        ("pull (unchanged)", lambda: gettext2sheets.handle_pull(service, file_list)),
+        ("pull (translated)", lambda: translate_and_pull(service, file_list)),
+    ]
+
+    results = []
+    for name, function in scenarios:
+        result = run_scenario(service, function)
+        result.update({"entries": entries, "scenario": name})
+        print_result(result)
+        results.append(result)
+    check_pulled_translations(service, file_list)
+
+    if args.mo:
+        check_mo_files(base / "gettext")
+    return results
+
+def configure(base, locales, service, args):
+    """Points gettext2sheets at the generated tree and the fake backend."""
+    os.chdir(str(base))
+    gettext2sheets.CONFIG = {
+        "path": str(base / "gettext"),
+        "spreadsheet_id": SPREADSHEET_ID,
+        "pull_chunk_size": args.chunk_size,
+        "read_requests_per_minute": args.requests_per_minute,
+        "write_requests_per_minute": args.requests_per_minute,
+        "locales": {locale: {"sheet": locale, "row_offset": 0, "column_offset": 0,
+                             "columns": COLUMNS if i % 2 == 0 else COLUMNS_WITHOUT_CONTEXT}
+                    for i, locale in enumerate(locales)}
+    }
+    gettext2sheets.BACKEND = 'fake'
+    gettext2sheets.FAKE_SERVICE = service
+    gettext2sheets.FAKE_STATE_FILES = {}
+    # Pooled clients would otherwise keep using the fake of the previous tree
+    gettext2sheets.SERVICE_POOL = gettext2sheets.ServicePool()
+    gettext2sheets.JOBS = args.jobs
+    gettext2sheets.PARSE_JOBS = args.parse_jobs
+    gettext2sheets.WRITE_MO = args.mo
+    # Parse processes do not write to the redirected stdout, so they are silenced instead
+    gettext2sheets.QUIET = True
+    gettext2sheets.FULL_PUSH = False
+    gettext2sheets.SCHEDULER = None
+    # Parse processes keep the configuration and working directory they were started with
+    if gettext2sheets.PARSE_POOL is not None:
+        gettext2sheets.PARSE_POOL.shutdown()
+        gettext2sheets.PARSE_POOL = None
+    # Every tree gets its own parse cache, inside its directory
+    if gettext2sheets.PARSE_CACHE is not None:
+        gettext2sheets.PARSE_CACHE.close()
+        gettext2sheets.PARSE_CACHE = None
+
+def generate_tree(path, locales, file_count, entries_per_file):
+    for locale in locales:
+        directory = path / locale / "LC_MESSAGES"
+        directory.mkdir(parents=True)
+        for i in range(file_count):
+            generate_po_file(directory / "domain{0}.po".format(i), locale, entries_per_file)
+
+def generate_po_file(path, locale, entry_count):
+    """
+    Writes a .po file with a mix of plain entries, entries with context, plural entries and
+    entries whose strings are wrapped over several lines. Entries with context come in pairs
+    with the same msgid.
+    """
+    with open(str(path), "w") as file:
+        file.write('msgid ""\nmsgstr ""\n"Language: {0}\\n"\n"Content-Type: '
+                   'text/plain; charset=UTF-8\\n"\n'.format(locale))
+        for n in range(entry_count):
+            file.write('\n#: src/module{0}.c:{1}\n'.format(n % 97, n))
+            if n % 10 == 0:
+                file.write('msgctxt "context {0}"\nmsgid "Shared {1}"\nmsgstr "{2} shared '
+                           '{3}"\n'.format(n % 3, n // 20, locale, n))
+            elif n % 7 == 0:
+                file.write('msgid "{0} item"\nmsgid_plural "{0} items"\n'
+                           'msgstr[0] "{0} {1} item"\nmsgstr[1] "{0} {1} items"\n'.format(n, locale))
+            elif n % 5 == 0:
+                file.write('msgid ""\n"Message {0}, which is long enough "\n"to be wrapped"\n'
+                           'msgstr ""\n"{1} message {0}, "\n"wrapped"\n'.format(n, locale))
+            else:
+                file.write('msgid "Message {0}"\nmsgstr "{1} message {0}"\n'.format(n, locale))
+
+def translate_and_pull(service, file_list):
+    """Edits every translation in the fake spreadsheet, as a translator would, then pulls."""
+    for rows in service.spreadsheets_data[SPREADSHEET_ID].values():
+        translated_column = rows[1].index(TRANSLATED_HEADER)
+        for row_number, row in rows.items():
+            if row_number > 1 and len(row) > translated_column:
+                row[translated_column] += " (edited)"
+    gettext2sheets.handle_pull(service, file_list)
+
+def check_pulled_translations(service, file_list):
+    """
+    Checks that every entry of the pulled files has the translation of its own row, as rows
+    of entries that share a msgid are easily mixed up. Raises an error otherwise.
+    """
+    translations = {}
+    for locale, rows in service.spreadsheets_data[SPREADSHEET_ID].items():
+        translated_column = rows[1].index(TRANSLATED_HEADER)
+        for row_number in sorted(rows)[1:]:
+            row = rows[row_number]
+            translations.setdefault((locale, row[0]), []).append(row[translated_column])
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for path in file_list:
+            locale = path.parent.parent.name
+            entries = [entry.get("msgstr", entry.get("msgstr[0]"))
+                       for entry in gettext2sheets.process_po_file(str(path))]
+            if entries != translations[(locale, path.name)]:
+                raise AssertionError("Pulled translations of {0} do not match its rows.".format(
+                    path))
+
+def check_mo_files(path):
+    """
+    Looks every message of the .mo files under `path` up through their hash table, the way
+    libintl does, raising an error if one is not found. Python's gettext module does not use
+    the hash table, so it cannot tell whether it is right.
+    """
+    mo_paths = list(path.glob("*/LC_MESSAGES/*.mo"))
+    if not mo_paths:
+        raise AssertionError("Pull did not write any .mo file.")
+    for mo_path in mo_paths:
+        data = mo_path.read_bytes()
+        _, _, count, keys_offset, _, hash_size, hash_offset = struct.unpack_from("7I", data)
+        for i in range(count):
+            length, offset = struct.unpack_from("2I", data, keys_offset + i * 8)
+            msgid = data[offset:offset + length].split(b"\0", 1)[0]
+            if find_mo_message(data, msgid, keys_offset, hash_size, hash_offset) != i:
+                raise AssertionError("{0} cannot be found in {1} through its hash table.".format(
+                    msgid, mo_path))
+
+def find_mo_message(data, msgid, keys_offset, hash_size, hash_offset):
+    """Returns the index of the message whose msgid is `msgid`, probing as libintl does."""
+    hash_value = gettext2sheets.hash_mo_key(msgid)
+    bucket = hash_value % hash_size
+    step = 1 + hash_value % (hash_size - 2)
+    while True:
+        index, = struct.unpack_from("I", data, hash_offset + bucket * 4)
+        if not index: return None
+        length, offset = struct.unpack_from("2I", data, keys_offset + (index - 1) * 8)
+        # Keys of plural messages are compared up to their first NUL, as with strcmp
+        if data[offset:offset + length].split(b"\0", 1)[0] == msgid: return index - 1
+        bucket = (bucket + step) % hash_size
+
+def run_scenario(service, function):
+    """Runs `function` with its output silenced, measuring time, requests and memory."""
+    service.reset_stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        function()
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = service.stats.values()
+    return {"seconds": elapsed,
+            "requests": sum(method["requests"] for method in stats),
+            "failures": sum(method["failures"] for method in stats),
+            "request_bytes": sum(method["request_bytes"] for method in stats),
+            "response_bytes": sum(method["response_bytes"] for method in stats),
+            "peak_memory_bytes": peak,
+            "requests_by_method": {name: method["requests"]
+                                   for name, method in service.stats.items()}}
+
+def print_result(result):
+    print("{entries:>8} entries | {scenario:<18} | {seconds:8.3f} s | {requests:>5} requests | "
+          "{sent:>9.1f} KB sent | {received:>9.1f} KB received | {peak:>8.1f} MB peak".format(
+              sent=result["request_bytes"] / 1024, received=result["response_bytes"] / 1024,
+              peak=result["peak_memory_bytes"] / 1024 / 1024, **result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+An in-process stand-in for the parts of the Google Sheets API used by gettext2sheets.
+
+It mimics the `service.spreadsheets()...execute()` call chain of googleapiclient, keeps sheet
+contents in memory and can simulate network latency and rate limiting errors, so that push and
+pull can be run and measured without a live spreadsheet or OAuth token.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+RE_RANGE = re.compile(r"^(.+)!([A-Z]+)(\d+):([A-Z]+)(\d+)$")
+
+# New sheets come with this many rows, and grow as data is written past them
+DEFAULT_ROW_COUNT = 1000
+
+
+class FakeSheetsService:
+    """
+    Holds the contents of every spreadsheet and sheet written through it, along with
+    statistics for every request. It is safe to share between threads.
+
+    Parameters:
+    latency - Seconds to wait before each request is answered, simulating a round trip
+    failure_rate - Fraction of requests that fail with a 429 (rate limited) error
+    """
+
+    def __init__(self, latency=0, failure_rate=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        # spreadsheet id -> sheet title -> row number -> list of cells
+        self.spreadsheets_data = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def spreadsheets(self):
+        return FakeSpreadsheets(self)
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+
+    def get_sheet(self, spreadsheet_id, title):
+        """Returns the rows of a sheet, creating it if needed. Must be called with `lock`."""
+        return self.spreadsheets_data.setdefault(spreadsheet_id, {}).setdefault(title, {})
+
+    def request(self, method, payload, operation):
+        """
+        Returns a request object that, once executed, waits for the simulated latency and
+        then runs `operation` while holding the lock. Sizes are recorded as JSON bytes.
+        """
+        return FakeRequest(self, method, payload, operation)
+
+    def record(self, method, payload, response):
+        method_stats = self.get_method_stats(method)
+        method_stats["requests"] += 1
+        method_stats["request_bytes"] += len(json.dumps(payload))
+        method_stats["response_bytes"] += len(json.dumps(response))
+
+    def record_failure(self, method):
+        self.get_method_stats(method)["failures"] += 1
+
+    def get_method_stats(self, method):
+        return self.stats.setdefault(method, {"requests": 0, "failures": 0, "request_bytes": 0,
+                                              "response_bytes": 0})
+
+
+class FakeHttpError(Exception):
+    """Mimics googleapiclient's HttpError, which keeps the HTTP response in `resp`."""
+    def __init__(self, status):
+        super().__init__("HTTP {0}".format(status))
+        self.resp = FakeResponse(status)
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeRequest:
+    def __init__(self, service, method, payload, operation):
+        self.service = service
+        self.method = method
+        self.payload = payload
+        self.operation = operation
+
+    def execute(self):
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        with self.service.lock:
+            if random.random() < self.service.failure_rate:
+                self.service.record_failure(self.method)
+                raise FakeHttpError(429)
+            response = self.operation()
+            self.service.record(self.method, self.payload, response)
+        return response
+
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def values(self):
+        return FakeValues(self.service)
+
+    def get(self, spreadsheetId, ranges=None, fields=None):
+        """Returns the properties of the requested sheets, or of all of them."""
+        def operation():
+            sheets = self.service.spreadsheets_data.get(spreadsheetId, {})
+            titles = ranges if ranges is not None else list(sheets.keys())
+            return {"sheets": [get_sheet_properties(title, sheets.get(title, {}))
+                               for title in titles]}
+        return self.service.request("get", {"ranges": ranges}, operation)
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId, range):
+        def operation():
+            return read_range(self.service, spreadsheetId, range)
+        return self.service.request("values.get", {"range": range}, operation)
+
+    def batchGet(self, spreadsheetId, ranges):
+        def operation():
+            return {"spreadsheetId": spreadsheetId,
+                    "valueRanges": [read_range(self.service, spreadsheetId, range_name)
+                                    for range_name in ranges]}
+        return self.service.request("values.batchGet", {"ranges": ranges}, operation)
+
+    def update(self, spreadsheetId, range, body, valueInputOption=None):
+        def operation():
+            return write_range(self.service, spreadsheetId, range, body.get("values", []))
+        return self.service.request("values.update", body, operation)
+
+    def batchClear(self, spreadsheetId, body):
+        def operation():
+            return {"spreadsheetId": spreadsheetId,
+                    "clearedRanges": [clear_range(self.service, spreadsheetId, range_name)
+                                      for range_name in body.get("ranges", [])]}
+        return self.service.request("values.batchClear", body, operation)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def operation():
+            responses = [write_range(self.service, spreadsheetId, value_range["range"],
+                                     value_range.get("values", []))
+                         for value_range in body.get("data", [])]
+            return {"spreadsheetId": spreadsheetId,
+                    "totalUpdatedRows": sum(r["updatedRows"] for r in responses),
+                    "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+                    "responses": responses}
+        return self.service.request("values.batchUpdate", body, operation)
+
+
+def get_sheet_properties(title, rows):
+    row_count = max([DEFAULT_ROW_COUNT] + list(rows.keys()))
+    return {"properties": {"title": title, "gridProperties": {"rowCount": row_count}}}
+
+def parse_range(range_name):
+    """Splits an 'A1' notation range such as 'Sheet1!A1:F20' into its parts, with 1-based indices."""
+    match = RE_RANGE.match(range_name)
+    if not match:
+        raise ValueError("Unsupported range: {0}".format(range_name))
+    sheet, column_start, row_start, column_end, row_end = match.groups()
+    return (sheet, get_column_index(column_start), int(row_start),
+            get_column_index(column_end), int(row_end))
+
+def get_column_index(column):
+    """Converts a letter-based column index, as is used in Google Sheets, to a number."""
+    n = 0
+    for char in column:
+        n = n * 26 + ord(char) - ord('A') + 1
+    return n
+
+def read_range(service, spreadsheet_id, range_name):
+    """
+    Reads a range the way the Sheets API does: trailing empty cells and rows are left out,
+    and the "values" key is missing altogether if the range is empty.
+    """
+    sheet, column_start, row_start, column_end, row_end = parse_range(range_name)
+    rows = service.get_sheet(spreadsheet_id, sheet)
+    values = []
+    for row_number in range(row_start, row_end + 1):
+        row = rows.get(row_number, [])[column_start - 1:column_end]
+        while row and row[-1] == "":
+            row.pop()
+        values.append(row)
+    while values and not values[-1]:
+        values.pop()
+
+    result = {"range": range_name, "majorDimension": "ROWS"}
+    if values:
+        result["values"] = values
+    return result
+
+def write_range(service, spreadsheet_id, range_name, values):
+    """Writes rows of values starting at the top-left corner of a range."""
+    sheet, column_start, row_start, _, _ = parse_range(range_name)
+    rows = service.get_sheet(spreadsheet_id, sheet)
+    for i, values_row in enumerate(values):
+        row = rows.setdefault(row_start + i, [])
+        row_end = column_start - 1 + len(values_row)
+        if len(row) < row_end:
+            row.extend([""] * (row_end - len(row)))
+        row[column_start - 1:row_end] = values_row
+
+    return {"updatedRange": range_name,
+            "updatedRows": len(values),
+            "updatedColumns": max([len(row) for row in values] + [0]),
+            "updatedCells": sum(len(row) for row in values)}
+
+def clear_range(service, spreadsheet_id, range_name):
+    """Empties the cells of a range. As in Sheets, the rows themselves are kept."""
+    sheet, column_start, row_start, column_end, row_end = parse_range(range_name)
+    rows = service.get_sheet(spreadsheet_id, sheet)
+    for row_number in range(row_start, row_end + 1):
+        row = rows.get(row_number)
+        if row is None: continue
+        cleared = len(row[column_start - 1:column_end])
+        row[column_start - 1:column_end] = [""] * cleared
+    return range_name
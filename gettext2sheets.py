@@ -1,16 +1,30 @@
 #!/usr/bin/python3
 
 import argparse
+import contextlib
 import datetime
-import googleapiclient.discovery
+import functools
+import gzip
+import hashlib
+import itertools
 import json
-import oauth2client.file, oauth2client.client, oauth2client.tools
 import os
+import pickle
+import random
 import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
 from enum import Enum
-from httplib2 import Http
 from pathlib import Path
 
+# The Google API client libraries take a while to import, so they are only imported once a
+# request is actually made. See `authorize_google_sheets`.
+
 # ANSI color codes
 C_RED = '\033[91m'
 C_GREEN = '\033[92m'
@@ -26,45 +40,650 @@ RE_ENTRY_FIELD = re.compile(r'^(msg.*)\s"(.*)"$')
 RE_EXTRA_STRING = re.compile(r'^\s*"(.*)"\s*$')
 RE_ASSIGN = re.compile(r"{([a-zA-Z_-]+)}")
 RE_ESCAPED_ASSIGN = re.compile(r"\\{([a-zA-Z_-]+)\\}")
+RE_PO_ESCAPE = re.compile(r'\\(x[0-9a-fA-F]+|[0-7]{1,3}|.)')
 
 GOOGLE_AUTH_SCOPES = 'https://www.googleapis.com/auth/spreadsheets'
 CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.json'
+DISCOVERY_URL = 'https://sheets.googleapis.com/$discovery/rest?version=v4'
+DISCOVERY_CACHE_FILE = 'discovery.json'
+DISCOVERY_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+SNAPSHOT_FILE = 'snapshot.json'
+CHUNK_SIZES_FILE = 'chunk_sizes.json'
+PARSE_CACHE_FILE = 'parse_cache.sqlite'
 
 CONFIG_FILE = 'config.json'
+DEFAULT_PUSH_BATCH_BYTES = 2000000
+DEFAULT_PULL_BATCH_RANGES = 50
+DEFAULT_PULL_CHUNK_SIZE_MIN = 50
+DEFAULT_PULL_CHUNK_SIZE_MAX = 10000
+DEFAULT_PULL_TARGET_SECONDS = 10
+DEFAULT_PULL_TARGET_BYTES = 8 * 1024 * 1024
+DEFAULT_PARSE_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_PARSE_CACHE_MAX_FILE_BYTES = 4 * 1024 * 1024
+DEFAULT_HTTP_TIMEOUT = 60
+# Request bodies smaller than this are sent as they are, as compressing them saves little
+GZIP_MIN_BYTES = 1024
+# Sheets allows 60 read and 60 write requests per minute per user by default
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_MAX_RETRIES = 5
+# In watch mode, how often files are checked for changes when inotify is not available
+WATCH_POLL_INTERVAL = 1
+REQUEST_BURST = 10
+BASE_BACKOFF = 1
+MAX_BACKOFF = 64
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MO_MAGIC = 0x950412de
+# Fields with the same value in every locale, which the catalog store interns
+INTERNED_FIELDS = {"msgid_plural"}
+PO_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "a": "\a", "b": "\b", "f": "\f", "v": "\v"}
 VERBOSE = False
+QUIET = False
 MODE = None
+JOBS = 1
+FULL_PUSH = False
+BACKEND = 'google'
+PULL_INTERVAL = 0
+DEBOUNCE = 2
+WRITE_MO = False
+PARSE_JOBS = 1
+
+# State that belongs to each thread, such as its stack of metric stages
+THREAD_STATE = threading.local()
+# Only one thread at a time may go through the authorization flow, whose credentials are
+# then shared by every API client
+AUTHORIZATION_LOCK = threading.Lock()
+CREDENTIALS = None
+# The fake backend is a single in-memory spreadsheet store, shared by all threads
+FAKE_SERVICE = None
+# Contents of the state files of the fake backend, see `load_state_file`
+FAKE_STATE_FILES = {}
+
+# Timings and counts collected for --metrics, or None if they are not being collected
+METRICS = None
+METRICS_FILE = None
+METRICS_LOCK = threading.Lock()
+
+# Every request goes through this scheduler, see `get_scheduler`
+SCHEDULER = None
+SCHEDULER_LOCK = threading.Lock()
+
+# Processes that parse files and build rows for push, see `get_parse_pool`
+PARSE_POOL = None
+PARSE_POOL_LOCK = threading.Lock()
+
+# Connection to the parse cache, shared by all threads under a lock
+PARSE_CACHE = None
+# In watch mode, parsed files are also kept in memory, as a map from (path, kind) to
+# (stamp, value). None when disabled.
+MEMORY_PARSE_CACHE = None
+PARSE_CACHE_LOCK = threading.Lock()
 
 class Mode(Enum):
     PUSH = 1
     PULL = 2
+    WATCH = 3
+
+class PoEntry:
+    """
+    A single entry from a .po file, with fields such as "msgctxt", "msgid", "msgid_plural",
+    "msgstr", "msgstr[0]", etc. Fields are stored as a tuple of (field, value) pairs in file
+    order, which takes far less memory than a dict for the handful of fields of an entry.
+    """
+    __slots__ = ("fields",)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get(self, field, default=None):
+        for name, value in self.fields:
+            if name == field:
+                return value
+        return default
+
+class CatalogStore:
+    """
+    Keeps entries of every locale in memory, with what they have in common stored once.
+
+    An entry is identified by its file name, msgctxt and msgid, which are the same in every
+    locale, so they are interned and stored once, with an id for each entry. Every other field
+    is kept per catalog, such as the .po files or the sheet of a locale, in the columns of a
+    `CatalogColumns`, instead of a dict per entry. Source texts that are also the same in every
+    locale, such as msgid_plural, are interned as well. Ids that no catalog uses anymore are
+    freed, and given to new entries.
+
+    A catalog may have several entries with the same key, such as rows of a sheet without a
+    msgctxt column for messages that only differ in context. These are told apart by the
+    order in which they were added, starting from occurrence 0.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+        # Number of catalogs that have each entry, by entry id
+        self.references = []
+        self.free_ids = []
+        # catalog -> CatalogColumns
+        self.catalogs = {}
+        # (catalog, file name) -> ids of the file's entries, in the order they were added
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def add_entries(self, catalog, fields, entries):
+        """
+        Stores the given (file name, (msgctxt, msgid), values) tuples in `catalog`, where
+        `values` are those of `fields`, in the same order, or None if the entry lacks them.
+        Entries whose key the catalog already has are stored as further occurrences of it.
+        """
+        interned = [field in INTERNED_FIELDS for field in fields]
+        with self.lock:
+            table = self.catalogs.get(catalog)
+            if table is None:
+                table = self.catalogs[catalog] = CatalogColumns()
+            entry_slots = []
+            for file_name, (msgctxt, msgid), _ in entries:
+                key = (sys.intern(file_name), msgctxt and sys.intern(msgctxt), sys.intern(msgid))
+                entry_id = self.ids.get(key)
+                if entry_id is None:
+                    entry_id = self.add_key(key)
+                self.files.setdefault((catalog, key[0]), []).append(entry_id)
+                slot = table.slots.get(entry_id)
+                if slot is None:
+                    slot = table.slots[entry_id] = table.take_slot()
+                    self.references[entry_id] += 1
+                else:
+                    slot = table.take_slot()
+                    table.duplicates.setdefault(entry_id, []).append(slot)
+                entry_slots.append(slot)
+
+            # Slots are taken empty, so only the given fields need to be filled
+            columns = table.columns
+            targets = [columns.setdefault(field, [None] * table.size) for field in fields]
+            for slot, (_, _, values) in zip(entry_slots, entries):
+                for column, value, intern in zip(targets, values, interned):
+                    column[slot] = sys.intern(value) if intern and value is not None else value
+
+    def add_key(self, key):
+        """Gives an id to a new key, reusing a freed one if there is any. Must hold `lock`."""
+        if self.free_ids:
+            entry_id = self.free_ids.pop()
+            self.keys[entry_id] = key
+        else:
+            entry_id = len(self.keys)
+            self.keys.append(key)
+            self.references.append(0)
+        self.ids[key] = entry_id
+        return entry_id
+
+    def release_key(self, entry_id):
+        """Frees the id of an entry once no catalog has it anymore. Must hold `lock`."""
+        self.references[entry_id] -= 1
+        if self.references[entry_id]: return
+        del self.ids[self.keys[entry_id]]
+        self.keys[entry_id] = None
+        self.free_ids.append(entry_id)
+
+    def get_entry(self, catalog, file_name, key, occurrence=0):
+        """
+        Returns the given occurrence of an entry in `catalog`, or None if the catalog does not
+        have that many.
+        """
+        table = self.catalogs.get(catalog)
+        entry_id = self.ids.get((file_name,) + key)
+        if table is None or entry_id not in table.slots: return None
+        if not occurrence:
+            return CatalogEntry(self, table, entry_id, table.slots[entry_id])
+        duplicates = table.duplicates.get(entry_id, ())
+        if occurrence > len(duplicates): return None
+        return CatalogEntry(self, table, entry_id, duplicates[occurrence - 1])
+
+    def has_file(self, catalog, file_name):
+        """Tells whether `catalog` has any entry of a file."""
+        return bool(self.files.get((catalog, file_name)))
+
+    def count_entries(self, catalog, file_name, key):
+        """Returns how many entries with the given key `catalog` has."""
+        table = self.catalogs.get(catalog)
+        entry_id = self.ids.get((file_name,) + key)
+        if table is None or entry_id not in table.slots: return 0
+        return 1 + len(table.duplicates.get(entry_id, ()))
+
+    def get_file_entries(self, catalog, file_name):
+        """Returns the entries of a file in `catalog`, in the order they were added."""
+        table = self.catalogs.get(catalog)
+        entry_ids = self.files.get((catalog, file_name), [])
+        if table is None: return []
+        if not table.duplicates:
+            return [CatalogEntry(self, table, entry_id, table.slots[entry_id])
+                    for entry_id in entry_ids]
+
+        entries = []
+        occurrences = {}
+        for entry_id in entry_ids:
+            occurrence = occurrences.get(entry_id, 0)
+            occurrences[entry_id] = occurrence + 1
+            slot = (table.duplicates[entry_id][occurrence - 1] if occurrence
+                    else table.slots[entry_id])
+            entries.append(CatalogEntry(self, table, entry_id, slot))
+        return entries
+
+    def drop_file(self, catalog, file_name):
+        """
+        Removes the entries of a file from `catalog`, freeing their slots, so that the file
+        can be added again.
+        """
+        with self.lock:
+            entry_ids = self.files.pop((catalog, file_name), [])
+            table = self.catalogs.get(catalog)
+            for entry_id in entry_ids:
+                # Further occurrences are freed along with the first one
+                slot = table.slots.pop(entry_id, None)
+                if slot is None: continue
+                table.free_slot(slot)
+                for duplicate in table.duplicates.pop(entry_id, ()):
+                    table.free_slot(duplicate)
+                self.release_key(entry_id)
+
+    def drop_catalog(self, catalog):
+        """Frees the columns of `catalog`, along with the ids that only it used."""
+        with self.lock:
+            table = self.catalogs.pop(catalog, None)
+            if table is not None:
+                for entry_id in table.slots:
+                    self.release_key(entry_id)
+            for file_key in [file_key for file_key in self.files if file_key[0] == catalog]:
+                del self.files[file_key]
+
+class CatalogColumns:
+    """
+    The fields of the entries of a catalog in the catalog store, each in a column: a list of
+    values indexed by the slot of each entry. A catalog only takes slots for its own entries,
+    however many the store holds, and slots that are freed are taken again by new entries.
+    """
+    def __init__(self):
+        # entry id -> slot of its first occurrence
+        self.slots = {}
+        # entry id -> slots of its further occurrences, in the order they were added
+        self.duplicates = {}
+        # field -> list of values, by slot
+        self.columns = {}
+        self.free_slots = []
+        self.size = 0
+
+    def take_slot(self):
+        """Returns an empty slot."""
+        if self.free_slots: return self.free_slots.pop()
+        self.size += 1
+        for column in self.columns.values():
+            column.append(None)
+        return self.size - 1
+
+    def free_slot(self, slot):
+        """Empties a slot, for `take_slot` to give out again."""
+        for column in self.columns.values():
+            column[slot] = None
+        self.free_slots.append(slot)
+
+class CatalogEntry:
+    """An entry of a catalog in the catalog store, read like a PoEntry."""
+    __slots__ = ("store", "table", "entry_id", "slot")
+
+    def __init__(self, store, table, entry_id, slot):
+        self.store = store
+        self.table = table
+        self.entry_id = entry_id
+        self.slot = slot
+
+    def get(self, field, default=None):
+        if field == "msgid":
+            value = self.store.keys[self.entry_id][2]
+        elif field == "msgctxt":
+            value = self.store.keys[self.entry_id][1]
+        else:
+            column = self.table.columns.get(field)
+            value = column[self.slot] if column is not None else None
+        return default if value is None else value
 
-# Load configuration
-with open(CONFIG_FILE) as config:
-    CONFIG = json.load(config)
+class CatalogRows:
+    """
+    The rows fetched for a file, as stored in the catalog store by `process_chunk`, mapped by
+    (msgctxt, msgid) keys. Rows may come from several catalogs, one for each shard of a
+    locale, which are read in order, as if their rows were all in the first one. Rows with
+    the same key are told apart by their occurrence, in that order.
+    """
+    def __init__(self, store, catalogs, file_name):
+        self.store = store
+        self.catalogs = catalogs
+        self.file_name = file_name
+
+    def get(self, key, occurrence=0):
+        for catalog in self.catalogs:
+            count = self.store.count_entries(catalog, self.file_name, key)
+            if occurrence < count:
+                return self.store.get_entry(catalog, self.file_name, key, occurrence)
+            occurrence -= count
+        return None
+
+    def count(self, key):
+        """Returns how many rows have the given key."""
+        return sum(self.store.count_entries(catalog, self.file_name, key)
+                   for catalog in self.catalogs)
+
+    def keys(self):
+        return {self.store.keys[entry_id][1:] for catalog in self.catalogs
+                for entry_id in self.store.files.get((catalog, self.file_name), [])}
+
+    def __len__(self):
+        return sum(len(self.store.files.get((catalog, self.file_name), []))
+                   for catalog in self.catalogs)
+
+# Entries of every locale, see `CatalogStore`
+CATALOG = CatalogStore()
+
+# Loaded by `load_config` once the script starts
+CONFIG = None
 
 def main():
     handle_args()
-    info("Requesting authorization from Google API...")
-    service = authorize_google_sheets()
-    file_list = find_files(CONFIG["path"], ".po")
+    start = time.perf_counter()
+    load_config()
+    # No client is created, and no authorization is requested, until a request is made
+    service = LazyService()
+    with measure("discovery"):
+        file_list = find_files(CONFIG["path"], ".po")
 
-    if MODE == Mode.PUSH: return handle_push(service, file_list)
-    if MODE == Mode.PULL: return handle_pull(service, file_list)
+    if MODE == Mode.PUSH: handle_push(service, file_list)
+    if MODE == Mode.PULL: handle_pull(service, file_list)
+    if MODE == Mode.WATCH: handle_watch(service, file_list)
+
+    if METRICS_FILE: write_metrics(METRICS_FILE, time.perf_counter() - start)
 
 def handle_args():
     """Handles command-line parameters."""
     global MODE
     global VERBOSE
+    global JOBS
+    global FULL_PUSH
+    global BACKEND
+    global QUIET
+    global METRICS
+    global METRICS_FILE
+    global PULL_INTERVAL
+    global DEBOUNCE
+    global WRITE_MO
+    global PARSE_JOBS
 
     parser = argparse.ArgumentParser(description='Sync Gettext messages to Google Sheets.')
     parser.add_argument('-v', '--verbose', action='store_true')
-    parser.add_argument('action', choices=['push', 'pull'])
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Only print warnings and the final summary.')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Writes timings and request statistics to FILE, as JSON.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of locales to process concurrently.')
+    parser.add_argument('-p', '--parse-jobs', type=int, default=1,
+                        help=('Number of processes that parse files during push, while '
+                              'rows that are ready are uploaded.'))
+    parser.add_argument('--full', action='store_true',
+                        help='Push every row, even the ones unchanged since the last push.')
+    parser.add_argument('--backend', choices=['google', 'fake'], default='google',
+                        help=('Where the spreadsheet lives. "fake" keeps it in memory, '
+                              'for testing and benchmarking without a Google account.'))
+    parser.add_argument('--mo', action='store_true',
+                        help='When pulling, also write a compiled .mo file for every updated file.')
+    parser.add_argument('--pull-interval', type=float, default=0, metavar='SECONDS',
+                        help='In watch mode, also pull changes from the sheet this often.')
+    parser.add_argument('--debounce', type=float, default=2, metavar='SECONDS',
+                        help=('In watch mode, how long files must stay unchanged before '
+                              'they are pushed.'))
+    parser.add_argument('action', choices=['push', 'pull', 'watch'])
 
     args = parser.parse_args()
 
-    MODE = Mode.PULL if args.action == 'pull' else Mode.PUSH
+    MODE = Mode[args.action.upper()]
     VERBOSE = args.verbose
+    JOBS = max(1, args.jobs)
+    PARSE_JOBS = max(1, args.parse_jobs)
+    FULL_PUSH = args.full
+    BACKEND = args.backend
+    QUIET = args.quiet and not args.verbose
+    METRICS_FILE = args.metrics
+    if METRICS_FILE: METRICS = new_metrics()
+    PULL_INTERVAL = args.pull_interval
+    DEBOUNCE = args.debounce
+    WRITE_MO = args.mo
+
+def load_config():
+    """Loads the configuration from `config.json`."""
+    global CONFIG
+    with open(CONFIG_FILE) as config:
+        CONFIG = json.load(config)
+
+class LazyService:
+    """
+    Stands in for an API client, creating it through `create_service` only once the first
+    request is made. Runs that have nothing to send, such as an unchanged incremental push,
+    never pay for importing the client libraries or authorizing.
+    """
+    def __init__(self):
+        self.service = None
+
+    def spreadsheets(self):
+        if self.service is None:
+            self.service = create_service()
+        return self.service.spreadsheets()
+
+class ServicePool:
+    """
+    Keeps API clients for workers to borrow. Each client holds its own persistent connections
+    and may only be used by one worker at a time, so there are as many as there are
+    concurrent workers. Once returned, a client and its open connections are reused by later
+    workers, even from other thread pools.
+    """
+    def __init__(self):
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def borrow(self):
+        with self.lock:
+            service = self.idle.pop() if self.idle else LazyService()
+        try:
+            yield service
+        finally:
+            with self.lock:
+                self.idle.append(service)
+
+SERVICE_POOL = ServicePool()
+
+class CompressingHttp:
+    """
+    Wraps an `httplib2.Http`, which keeps a persistent connection to each host, so that large
+    request bodies are sent gzip-compressed. Like the wrapped object, it must only be used by
+    one thread at a time.
+    """
+    def __init__(self, http, compress_requests):
+        self.http = http
+        self.compress_requests = compress_requests
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        headers = dict(headers or {})
+        # Compressed responses are always welcome, and httplib2 decompresses them
+        headers.setdefault("accept-encoding", "gzip, deflate")
+        if (self.compress_requests and body and len(body) >= GZIP_MIN_BYTES
+                and "content-encoding" not in headers):
+            if isinstance(body, str): body = body.encode("utf-8")
+            body = gzip.compress(body, compresslevel=6)
+            headers["content-encoding"] = "gzip"
+            headers["content-length"] = str(len(body))
+        return self.http.request(uri, method, body, headers, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+class RequestScheduler:
+    """
+    Every Sheets API request goes through here. Requests are spread out by a token bucket for
+    each kind of request ("read" or "write"), so that they stay within the per-minute quotas,
+    and retryable errors (rate limiting, server errors and connection problems) are retried
+    with exponential backoff and jitter. Identical reads made at the same time by different
+    workers are coalesced into a single request.
+    """
+    def __init__(self, buckets, max_retries):
+        self.buckets = buckets
+        self.max_retries = max_retries
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def execute(self, request, kind, key=None):
+        """
+        Executes `request` and returns its response. If `key` is given, and a request with the
+        same key is already in flight, its response is shared instead.
+        """
+        if key is None:
+            return self.execute_with_retries(request, kind)
+
+        with self.lock:
+            pending = self.in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.in_flight[key] = {"done": threading.Event()}
+
+        if not owner:
+            verbose_info("Sharing the response of an identical request in flight.")
+            pending["done"].wait()
+            if "error" in pending: raise pending["error"]
+            THREAD_STATE.request_stats = pending["stats"]
+            return pending["response"]
+
+        try:
+            pending["response"] = self.execute_with_retries(request, kind)
+            pending["stats"] = THREAD_STATE.request_stats
+            return pending["response"]
+        except Exception as e:
+            pending["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            pending["done"].set()
+
+    def execute_with_retries(self, request, kind):
+        failures = 0
+        for attempt in range(self.max_retries + 1):
+            self.buckets[kind].take()
+            start = time.perf_counter()
+            try:
+                response = request.execute()
+                THREAD_STATE.request_stats = (time.perf_counter() - start, failures)
+                return response
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e): raise
+                # Being rate limited says nothing about the request itself
+                if not is_rate_limit_error(e): failures += 1
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+                warn("Request failed ({0}), retrying in {1:.1f}s...".format(e, delay))
+                time.sleep(delay)
+
+class TokenBucket:
+    """
+    Lets `per_minute` operations through per minute on average, allowing short bursts of up
+    to `capacity` operations. A rate of zero means there is no limit.
+    """
+    def __init__(self, per_minute, capacity):
+        self.rate = per_minute / 60
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Takes a token, sleeping until one is available."""
+        if not self.rate: return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative, which reserves them for callers that are already waiting
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            verbose_info("Waiting {0:.2f}s to stay within the request quota...", wait)
+            time.sleep(wait)
+
+def is_retryable_error(e):
+    """
+    Tells whether a failed request may succeed if it is sent again, i.e. if it was rate
+    limited, failed on the server side, or could not reach the server.
+    """
+    # googleapiclient's HttpError keeps the HTTP response in `resp`
+    status = getattr(getattr(e, "resp", None), "status", None)
+    if status is not None:
+        return int(status) in RETRYABLE_STATUSES
+    return isinstance(e, OSError)
+
+def is_rate_limit_error(e):
+    """Tells whether a failed request was turned down for going over the request quota."""
+    status = getattr(getattr(e, "resp", None), "status", None)
+    return status is not None and int(status) == 429
+
+def get_request_stats():
+    """
+    Returns how long the last request made by this thread took, not counting waits for the
+    quota or retries, and how many times it failed before that for reasons other than rate
+    limiting, such as timeouts and server errors.
+    """
+    return THREAD_STATE.request_stats
+
+def get_scheduler():
+    """Returns the scheduler shared by all workers, creating it from the configuration."""
+    global SCHEDULER
+    with SCHEDULER_LOCK:
+        if SCHEDULER is None:
+            buckets = {}
+            for kind in ("read", "write"):
+                per_minute = CONFIG.get("{0}_requests_per_minute".format(kind),
+                                        DEFAULT_REQUESTS_PER_MINUTE)
+                buckets[kind] = TokenBucket(per_minute, min(per_minute, REQUEST_BURST))
+            SCHEDULER = RequestScheduler(buckets, CONFIG.get("max_retries", DEFAULT_MAX_RETRIES))
+        return SCHEDULER
+
+def get_parse_pool():
+    """
+    Returns the process pool shared by all workers to parse files, or None if files are
+    parsed by the workers themselves. The pool is kept until the script exits.
+    """
+    global PARSE_POOL
+    if PARSE_JOBS == 1: return None
+    with PARSE_POOL_LOCK:
+        if PARSE_POOL is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Forking a process that runs threads is unsafe, so workers start from scratch
+            PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_JOBS,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_parse_process,
+                                             initargs=(CONFIG, VERBOSE, QUIET))
+        return PARSE_POOL
+
+def init_parse_process(config, verbose, quiet):
+    """Sets up a process of the parse pool with the settings of the main one."""
+    global CONFIG, VERBOSE, QUIET
+    CONFIG = config
+    VERBOSE = verbose
+    QUIET = quiet
+
+def create_service():
+    """Returns a new API client for the selected backend."""
+    global FAKE_SERVICE
+    if BACKEND == 'fake':
+        if FAKE_SERVICE is None:
+            import fake_sheets
+            FAKE_SERVICE = fake_sheets.FakeSheetsService()
+        return FAKE_SERVICE
+
+    info("Requesting authorization from Google API...")
+    return authorize_google_sheets()
 
 def authorize_google_sheets():
     """
@@ -73,14 +692,82 @@ def authorize_google_sheets():
     https://console.developers.google.com/flows/enableapi?apiid=sheets.googleapis.com
 
     Once authenticated, a `token.json` will be generated for subsequent accesses.
+    Every client gets its own connections, through `create_http`, but the credentials are
+    only loaded once.
+    """
+    global CREDENTIALS
+    import oauth2client.file, oauth2client.client, oauth2client.tools
+
+    # Workers may authorize at the same time, but the flow must only be completed once
+    with AUTHORIZATION_LOCK:
+        if CREDENTIALS is None or CREDENTIALS.invalid:
+            store = oauth2client.file.Storage(TOKEN_FILE)
+            creds = store.get()
+            if not creds or creds.invalid:
+                flow = oauth2client.client.flow_from_clientsecrets(CREDENTIALS_FILE,
+                                                                   GOOGLE_AUTH_SCOPES)
+                creds = oauth2client.tools.run_flow(flow, store)
+            CREDENTIALS = creds
+        creds = CREDENTIALS
+
+    return build_sheets_service(creds.authorize(create_http()))
+
+def create_http():
+    """
+    Creates the HTTP transport of an API client, with the timeout given by "http_timeout" and
+    request compression unless "compress_requests" is false.
+    """
+    from httplib2 import Http
+    http = Http(timeout=CONFIG.get("http_timeout", DEFAULT_HTTP_TIMEOUT))
+    return CompressingHttp(http, CONFIG.get("compress_requests", True))
+
+def build_sheets_service(http):
+    """
+    Builds the Sheets API client from a locally cached discovery document, which describes
+    the API. The document is only downloaded if it is not cached, or if the cached copy is
+    older than DISCOVERY_CACHE_MAX_AGE seconds. Should the download fail, an outdated copy is
+    used if there is one, and the client is otherwise built the regular way.
     """
-    store = oauth2client.file.Storage(TOKEN_FILE)
-    creds = store.get()
-    if not creds or creds.invalid:
-        flow = oauth2client.client.flow_from_clientsecrets(CREDENTIALS_FILE, GOOGLE_AUTH_SCOPES)
-        creds = oauth2client.tools.run_flow(flow, store)
+    import googleapiclient.discovery
 
-    return googleapiclient.discovery.build('sheets', 'v4', http=creds.authorize(Http()))
+    cached_document = None
+    try:
+        with open(DISCOVERY_CACHE_FILE) as file:
+            cached_document = file.read()
+        if time.time() - os.path.getmtime(DISCOVERY_CACHE_FILE) < DISCOVERY_CACHE_MAX_AGE:
+            return googleapiclient.discovery.build_from_document(cached_document, http=http)
+        verbose_info("Cached discovery document is outdated, fetching it...")
+    except (OSError, ValueError):
+        cached_document = None
+        verbose_info("Discovery document is not cached, fetching it...")
+
+    document = fetch_discovery_document(http)
+    if document is None:
+        # An outdated document still describes the API better than nothing
+        if cached_document is not None:
+            warn("Using the outdated discovery document cached in {0}.".format(
+                DISCOVERY_CACHE_FILE))
+            return googleapiclient.discovery.build_from_document(cached_document, http=http)
+        warn("Building the client without caching the discovery document.")
+        return googleapiclient.discovery.build('sheets', 'v4', http=http)
+
+    with open("{0}.tmp".format(DISCOVERY_CACHE_FILE), "w") as file:
+        file.write(document)
+    os.replace("{0}.tmp".format(DISCOVERY_CACHE_FILE), DISCOVERY_CACHE_FILE)
+    return googleapiclient.discovery.build_from_document(document, http=http)
+
+def fetch_discovery_document(http):
+    """Downloads the discovery document of the Sheets API, returning None if that fails."""
+    try:
+        response, content = http.request(DISCOVERY_URL)
+    except Exception as e:
+        # httplib2 raises its own errors, such as ServerNotFoundError, besides socket errors
+        warn("Could not fetch the discovery document ({0}).".format(e))
+        return None
+    if response.status != 200:
+        warn("Could not fetch the discovery document (HTTP {0}).".format(response.status))
+        return None
+    return content.decode("utf-8")
 
 def find_files(path, extension):
     """Returns a list of paths to all files that are inside `path` and have the given extension."""
@@ -107,36 +794,350 @@ def handle_push(service, file_list):
     Sends local message data from all .po files to a Google Sheets spreadsheet.
     """
     info("Mode was set to PUSH.")
-    locale_row_offsets = {}
+    spreadsheet_id = CONFIG["spreadsheet_id"]
+    # A full push sends every row again, but still clears those left over, see `new_shard_state`
+    snapshot = load_snapshot(spreadsheet_id)
+    tasks = []
 
-    for posix_path in file_list:
-        path_string = str(posix_path)
-        locale = get_locale_by_path(path_string)
-        info("File __{0}__ is from locale __{1}__".format(posix_path, locale))
-        file_entries = process_po_file(path_string)
+    for locale, paths in group_files_by_locale(file_list).items():
         try:
             settings = CONFIG["locales"][locale]
         except KeyError as e:
-            warn("Missing configuration for this locale, skipping...")
+            warn("Missing configuration for locale {0}, skipping...".format(locale))
             continue
+        tasks.append((locale, paths, settings, snapshot))
 
-        # Only print header once
-        print_header = locale not in locale_row_offsets.keys()
-        # Cumulative offset
-        row_offset = locale_row_offsets.get(locale, settings["row_offset"])
-        # Metadata
-        metadata = {"file_name": posix_path.name,
-                    "locale": locale,
-                    "timestamp": str(datetime.datetime.now())}
-
-        range_str, body = build_request_body(settings, file_entries,
-                                                row_offset, print_header, metadata)
-        verbose_info("Body: {0}".format(body))
-        result = update_sheet(service, CONFIG["spreadsheet_id"], range_str, body)
-        verbose_info("Result: {0}".format(str(result)))
-        updated_rows = result.get('updatedRows', 0)
-        info("Updated {0} rows successfully.".format(updated_rows))
-        locale_row_offsets[locale] = row_offset + updated_rows
+    print_summary(run_workers(service, push_by_locale, tasks))
+    save_snapshot(spreadsheet_id, snapshot)
+
+def push_by_locale(service, locale, paths, settings, snapshot):
+    """
+    Sends the entries of all .po files from a single locale to its sheet, or to its shards.
+
+    Files are parsed in order, by the parse pool if there is one, and every batch of rows
+    that fills up is sent right away, while the following files are still being parsed.
+    Only rows that differ from the ones recorded in `snapshot` by the last push are sent.
+    The snapshot is then updated with the rows of this push. Returns a summary of the work done.
+    """
+    info("Handling push for locale {0}.", locale)
+    columns = settings["columns"]
+    ignored_columns = get_volatile_columns(columns)
+    shards = get_shards(settings)
+    shard_states = [new_shard_state(locale, shard, len(shards), snapshot) for shard in shards]
+    summary = {"locale": locale, "files": len(paths), "rows": 0, "requests": 0}
+    file_rows = build_files_rows(locale, paths, settings, ignored_columns)
+
+    for posix_path in paths:
+        with measure("building", locale, posix_path):
+            values, row_hashes = next(file_rows)
+            verbose_info("Rows: {0}", values)
+            # Rows are placed in file order, so that row offsets do not depend on timing
+            for state, start, end in split_rows(settings, shard_states, posix_path.name,
+                                                len(values)):
+                add_shard_rows(state, values[start:end], row_hashes[start:end], columns,
+                               ignored_columns)
+        count_file(posix_path, rows=len(values))
+
+        for state in shard_states:
+            updated_rows, requests = push_shard(service, locale, state, flush=False)
+            summary["rows"] += updated_rows
+            summary["requests"] += requests
+
+    for state in shard_states:
+        if len(state["hashes"]) < state["previous_count"]: state["changed"] = True
+
+    # Shards are independent from each other, so what is left is sent concurrently
+    tasks = [(locale, state) for state in shard_states]
+    for updated_rows, requests in run_workers(service, push_shard, tasks):
+        summary["rows"] += updated_rows
+        summary["requests"] += requests
+
+    if not any(state["changed"] for state in shard_states):
+        info("Locale {0} is unchanged since the last push.", locale)
+
+    for state in shard_states:
+        snapshot[state["key"]] = {"layout": hash_layout(state["settings"]),
+                                  "rows": state["hashes"]}
+    return summary
+
+def build_files_rows(locale, paths, settings, ignored_columns):
+    """
+    Yields, in the order of `paths`, the rows of each file and their hashes.
+    With a parse pool, all files are handed to it up front, and parsed in parallel.
+    """
+    tasks = [(locale, str(posix_path), posix_path.name, settings, ignored_columns)
+             for posix_path in paths]
+    pool = get_parse_pool()
+    if pool is None or len(paths) < 2:
+        return (build_file_rows(*task) for task in tasks)
+    return pool.map(build_file_rows, *zip(*tasks))
+
+def build_file_rows(locale, path, file_name, settings, ignored_columns):
+    """Parses a .po file and builds its rows, without a header, along with their hashes."""
+    file_entries = measure_iter(process_po_file(path), "parsing", locale, path)
+    # Metadata
+    metadata = {"file_name": file_name,
+                "locale": locale,
+                "timestamp": str(datetime.datetime.now())}
+
+    _, body = build_request_body(settings, file_entries, 0, False, metadata)
+    values = body["values"]
+    return values, [hash_row(row, ignored_columns) for row in values]
+
+def get_shards(settings):
+    """
+    Returns the settings of each shard of a locale, which are the locale's own settings
+    overridden by those of the shard, such as its "sheet" and "spreadsheet_id".
+    A locale without "shards" is a single shard.
+    """
+    shard_by = settings.get("shard_by", "file")
+    if shard_by not in ("file", "rows"):
+        error("Unknown shard_by value {0}, use either 'file' or 'rows'.".format(shard_by))
+    if shard_by == "rows" and "shard_rows" not in settings:
+        error("Sharding by rows needs a shard_rows setting.")
+
+    defaults = dict(settings, spreadsheet_id=CONFIG["spreadsheet_id"])
+    return [dict(defaults, **shard) for shard in settings.get("shards", [{}])]
+
+def new_shard_state(locale, settings, shard_count, snapshot):
+    """Prepares what is needed to build the rows of one shard, given its previous push."""
+    key = locale
+    if shard_count > 1:
+        key = "{0}/{1}/{2}".format(locale, settings["spreadsheet_id"], settings["sheet"])
+    previous = snapshot.get(key)
+    previous_hashes = []
+    if previous and previous["layout"] == hash_layout(settings):
+        previous_hashes = previous["rows"]
+    # Rows past the end of this push are cleared, so the row count is kept even when a full
+    # push ignores the hashes
+    return {"key": key, "settings": settings, "previous": [] if FULL_PUSH else previous_hashes,
+            "previous_count": len(previous_hashes), "hashes": [], "pending": [],
+            "pending_sizes": [], "pending_bytes": 0, "changed": False}
+
+def split_rows(settings, shard_states, file_name, row_count):
+    """
+    Splits the rows of a file between the shards of its locale, yielding (shard, start, end)
+    tuples, where `end` is exclusive.
+
+    With "shard_by": "file", the default, each file goes to a shard chosen by its name, so it
+    stays there as other files come and go. With "shard_by": "rows", shards are filled in
+    order with up to "shard_rows" rows each, and the last shard takes whatever is left.
+    """
+    if len(shard_states) == 1 or settings.get("shard_by", "file") == "file":
+        yield shard_states[get_file_shard_index(file_name, len(shard_states))], 0, row_count
+        return
+
+    start = 0
+    for i, state in enumerate(shard_states):
+        if start >= row_count: return
+        # The header is not counted
+        used = max(0, len(state["hashes"]) - 1)
+        end = row_count if i == len(shard_states) - 1 else start + settings["shard_rows"] - used
+        if end <= start: continue
+        yield state, start, min(end, row_count)
+        start = end
+
+def get_file_shard_index(file_name, shard_count):
+    """Returns the index of the shard that holds a file, when sharding by file."""
+    return zlib.crc32(file_name.encode("utf-8")) % shard_count
+
+def add_shard_rows(state, values, row_hashes, columns, ignored_columns):
+    """
+    Appends rows, with their hashes, to a shard, after its header if it has none yet.
+    The rows that changed since the previous push are laid out as value ranges to be sent.
+    """
+    settings = state["settings"]
+    if not state["hashes"]:
+        header = get_header_row(columns)
+        values = [header] + values
+        row_hashes = [hash_row(header, ignored_columns)] + row_hashes
+    column_start, column_end = get_column_range(settings)
+    row_offset = settings["row_offset"] + len(state["hashes"])
+    position = len(state["hashes"])
+    previous_hashes = state["previous"][position:position + len(values)]
+
+    # Ranges are laid out up front, so every write can be sent in a few batches
+    for run_start, run_end in get_changed_runs(row_hashes, previous_hashes):
+        range_name = generate_range_name(settings["sheet"], 1 + row_offset + run_start,
+                                         row_offset + run_end, column_start, column_end)
+        value_range = {"range": range_name, "values": values[run_start:run_end]}
+        size = len(json.dumps(value_range))
+        state["pending"].append(value_range)
+        state["pending_sizes"].append(size)
+        state["pending_bytes"] += size
+        state["changed"] = True
+    state["hashes"].extend(row_hashes)
+
+def push_shard(service, locale, state, flush=True):
+    """
+    Sends the pending value ranges of a shard in batches. Unless `flush` is set, only batches
+    that are full are sent, and the rest is kept for later. Returns the rows updated and
+    requests made.
+    """
+    updated_total = 0
+    requests = 0
+    batch_bytes = CONFIG.get("push_batch_bytes", DEFAULT_PUSH_BATCH_BYTES)
+    if not flush and state["pending_bytes"] < batch_bytes: return 0, 0
+
+    batches = list(batch_by_payload_size(state["pending"], batch_bytes, state["pending_sizes"]))
+    pending = batches.pop() if batches and not flush else []
+    state["pending"] = pending
+    state["pending_sizes"] = state["pending_sizes"][len(state["pending_sizes"]) - len(pending):]
+    state["pending_bytes"] = sum(state["pending_sizes"])
+
+    for batch in batches:
+        info("Sending a batch of {0} ranges...", len(batch))
+        with measure("api", locale):
+            result = batch_update_sheet(service, state["settings"]["spreadsheet_id"], batch)
+        verbose_info("Result: {0}", result)
+        updated_rows = result.get('totalUpdatedRows', 0)
+        count_request(locale, batch, result, updated_rows)
+        info("Updated {0} rows successfully.", updated_rows)
+        updated_total += updated_rows
+        requests += 1
+
+    if flush and len(state["hashes"]) < state["previous_count"]:
+        clear_shard_tail(service, locale, state)
+        requests += 1
+    return updated_total, requests
+
+def clear_shard_tail(service, locale, state):
+    """
+    Clears the rows of a shard that the previous push wrote past where this one ends, such as
+    those of removed entries, so that pull finds no stale copies of any entry there.
+    """
+    settings = state["settings"]
+    column_start, column_end = get_column_range(settings)
+    range_name = generate_range_name(settings["sheet"],
+                                     1 + settings["row_offset"] + len(state["hashes"]),
+                                     settings["row_offset"] + state["previous_count"],
+                                     column_start, column_end)
+    info("Clearing {0}, which is left over from the last push...", range_name)
+    with measure("api", locale):
+        result = batch_clear_sheet(service, settings["spreadsheet_id"], [range_name])
+    count_request(locale, [range_name], result, 0)
+
+def get_volatile_columns(columns):
+    """
+    Returns the indices of columns whose value changes on every push, e.g. '{timestamp}'.
+    These are not taken into account when deciding whether a row has changed.
+    """
+    return {i for i, column in enumerate(columns) if "{timestamp}" in column.get("static", "")}
+
+def hash_row(row, ignored_columns):
+    """Returns a short content hash for a row of values, skipping `ignored_columns`."""
+    values = [value for i, value in enumerate(row) if i not in ignored_columns]
+    return hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()[:16]
+
+def hash_layout(settings):
+    """
+    Returns a hash of the settings that determine where rows are placed in the sheet.
+    Row hashes from a snapshot are only comparable if this hash has not changed.
+    """
+    layout = [settings["sheet"], settings["row_offset"], settings["column_offset"],
+              settings["columns"]]
+    return hashlib.sha1(json.dumps(layout, sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_changed_runs(row_hashes, previous_hashes):
+    """
+    Yields (start, end) index pairs, with `end` exclusive, for each run of consecutive rows
+    whose hash differs from the one at the same position in `previous_hashes`.
+    When rows shift, every row from the shift onwards is different, so it is rewritten.
+    """
+    run_start = None
+    for i, row_hash in enumerate(row_hashes):
+        changed = i >= len(previous_hashes) or previous_hashes[i] != row_hash
+        if changed and run_start is None:
+            run_start = i
+        elif not changed and run_start is not None:
+            yield run_start, i
+            run_start = None
+    if run_start is not None:
+        yield run_start, len(row_hashes)
+
+def load_snapshot(spreadsheet_id):
+    """
+    Reads the snapshot of the rows sent by the last push to the given spreadsheet.
+    Returns a map from each locale to its layout hash and row hashes.
+    """
+    return load_state_file(SNAPSHOT_FILE).get(spreadsheet_id, {})
+
+def save_snapshot(spreadsheet_id, snapshot):
+    """Persists the snapshot of the rows sent to the given spreadsheet."""
+    snapshots = load_state_file(SNAPSHOT_FILE)
+    snapshots[spreadsheet_id] = snapshot
+    save_state_file(SNAPSHOT_FILE, snapshots)
+
+def load_state_file(path):
+    """
+    Reads a JSON file that keeps what was sent to or fetched from the spreadsheet, such as
+    the snapshot. Returns an empty dict if there is none.
+
+    With the fake backend, these files are kept in memory instead, for as long as the fake
+    spreadsheet they describe, so that they never get mixed up with those of a real one.
+    """
+    if BACKEND == 'fake':
+        return json.loads(FAKE_STATE_FILES.get(path, "{}"))
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def save_state_file(path, data):
+    """Writes a JSON file read by `load_state_file`, replacing it at once."""
+    if BACKEND == 'fake':
+        FAKE_STATE_FILES[path] = json.dumps(data)
+        return
+    with open("{0}.tmp".format(path), "w") as file:
+        json.dump(data, file)
+    os.replace("{0}.tmp".format(path), path)
+
+def group_files_by_locale(file_list):
+    """Returns a map from each locale to the list of paths of its .po files."""
+    locale_file_paths = {}
+
+    for posix_path in file_list:
+        locale = get_locale_by_path(str(posix_path))
+        info("File __{0}__ is from locale __{1}__", posix_path, locale)
+        locale_file_paths.setdefault(locale, []).append(posix_path)
+
+    return locale_file_paths
+
+def run_workers(service, worker, tasks):
+    """
+    Calls `worker(service, *task)` for every task, returning their results in task order.
+    Used for locales, and for the shards of each locale.
+
+    With more than one job, tasks run on a thread pool and each task borrows an API client
+    from SERVICE_POOL, so that `service` is only used from the thread that called this.
+    """
+    if JOBS == 1 or len(tasks) < 2:
+        return [worker(service, *task) for task in tasks]
+
+    def run_task(task):
+        with SERVICE_POOL.borrow() as task_service:
+            return worker(task_service, *task)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=JOBS) as executor:
+        return list(executor.map(run_task, tasks))
+
+def print_summary(summaries):
+    """
+    Prints the per-locale summaries returned by workers, followed by their totals, even when
+    --quiet is set. Every key in a summary, other than "locale", holds a count.
+    """
+    totals = {}
+    for summary in summaries:
+        counts = {key: value for key, value in summary.items() if key != "locale"}
+        print(highlight("Locale __{0}__: {1}.".format(summary["locale"], format_counts(counts))))
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+    print(highlight("__Total__: {0}.".format(format_counts(totals))))
+
+def format_counts(counts):
+    return ", ".join("{0} {1}".format(value, key) for key, value in counts.items())
 
 def get_locale_by_path(path):
     """
@@ -152,37 +1153,76 @@ def get_locale_by_path(path):
 
 def process_po_file(path):
     """
-    Builds a list of entries from a .po file.
-    Each entry will contain keys such as "msgid", "msgstr", "msgid_plural", "msgstr[0]", etc.
-    """
-    with open(path) as file:
-        entry = {}
-        entries = []
-        info("Reading file __{0}__...".format(path))
-
-        for line in file:
-            line = line.strip()
-            match = RE_ENTRY_FIELD.match(line)
-            if match:
-                field = match.group(1)
-                value = match.group(2)
+    Reads the entries of a .po file one at a time, without holding the whole catalog in memory.
+    Yields a PoEntry for every entry other than the header, with continuation strings joined.
 
-                # If this field is already tracked, we finished our last entry
-                if field in entry.keys():
-                    # Prevent adding the empty msgid from the header
-                    if any(entry.values()):
-                        entries.append(entry)
-                    entry = {}
+    Parsed entries are stored in the parse cache, and read from it while the file is unchanged.
+    """
+    info("Reading file __{0}__...", path)
+    stamp = get_file_stamp(path)
+    cached = read_parse_cache(path, "entries", stamp)
+    if cached is not None:
+        for fields in cached:
+            # The catalog store, used in watch mode, holds entries rather than their fields
+            yield fields if isinstance(fields, CatalogEntry) else PoEntry(fields)
+        info("Read {0} cached entries!", len(cached))
+        return
+
+    parsed = [] if caches_parsed_entries(path) else None
+    count = 0
+
+    with open(path, "rb") as file:
+        for _, _, fields in scan_po_file(file):
+            # Skip the header, which is the entry with an empty msgid and no context
+            if fields.get("msgid") == "" and "msgctxt" not in fields: continue
+            fields = tuple(fields.items())
+            if parsed is not None: parsed.append(fields)
+            count += 1
+            yield PoEntry(fields)
+
+    if parsed is not None: write_parse_cache(path, "entries", stamp, parsed)
+    info("Read {0} entries!", count)
+
+def scan_po_file(file):
+    """
+    Reads the entries of a .po file, opened in binary mode, in a single sequential pass.
+    Any other iterable of byte lines, such as the lines of a single entry, can be read as well.
 
-                entry[field] = value
+    Yields a (start, end, fields) tuple for each entry. `start` and `end` are the byte offsets
+    delimiting the entry's "msg*" lines and their continuation strings, so comments and blank
+    lines preceding an entry are not part of its span. `fields` maps each field to its value,
+    in file order, with continuation strings joined.
+    """
+    offset = 0
+    start = end = None
+    fields = {}
+    field = None
+
+    for raw_line in file:
+        line_end = offset + len(raw_line)
+        line = raw_line.decode("utf-8").strip()
+        match = RE_ENTRY_FIELD.match(line)
 
-        # Append last entry
-        if entry:
-            entries.append(entry)
+        if match:
+            # A field that is already tracked, or a gap since the last field line,
+            # means that a new entry begins here.
+            if start is None or end != offset or match.group(1) in fields:
+                if start is not None: yield start, end, fields
+                start = offset
+                fields = {}
+            field = match.group(1)
+            fields[field] = match.group(2)
+            end = line_end
+        elif start is not None and end == offset:
+            # Continuation strings are part of the field above them
+            extra_match = RE_EXTRA_STRING.match(line)
+            if extra_match:
+                fields[field] += extra_match.group(1)
+                end = line_end
 
-    info("Read {0} entries!".format(len(entries)))
+        offset = line_end
 
-    return entries
+    if start is not None: yield start, end, fields
 
 def build_request_body(settings, entries, row_offset, print_header, metadata):
     """
@@ -191,21 +1231,23 @@ def build_request_body(settings, entries, row_offset, print_header, metadata):
     right columns according to the user's configuration.
     """
     sheet = settings["sheet"]
-    entry_count = len(entries)
+    columns = settings["columns"]
+    # Entries may be a generator, so rows are built before the range can be determined
+    rows = [build_request_entry(columns, entry, metadata) for entry in entries]
+    entry_count = len(rows)
     if not entry_count:
         warn("No entries found in this file, no changes were pushed.")
 
     row_start = 1 + row_offset
     row_end = row_start + entry_count - 1 + print_header
-    columns = settings["columns"]
-    column_start = get_column_string(1 + settings["column_offset"])
-    column_end = get_column_string(1 + settings["column_offset"] + len(columns) - 1)
+    column_start, column_end = get_column_range(settings)
     range_name = generate_range_name(sheet, row_start, row_end, column_start, column_end)
-    headers = [[column["header"] for column in columns]] if print_header else []
+    headers = [get_header_row(columns)] if print_header else []
+
+    return (range_name, {'values': headers + rows})
 
-    return (range_name,
-            {'values': headers +
-                       [build_request_entry(columns, entry, metadata) for entry in entries]})
+def get_header_row(columns):
+    return [column["header"] for column in columns]
 
 def build_request_entry(columns, entry, metadata):
     """Processes all columns from a single entry."""
@@ -213,14 +1255,14 @@ def build_request_entry(columns, entry, metadata):
 
 def populate_column(column, entry, metadata):
     """Decides the data that will fill a single column from a specific entry."""
-    keys = entry.keys()
     static_text = column.get("static")
     if static_text:
         return parse_static_text(static_text, metadata)
     eligible_fields = column["fields"]
     for field in eligible_fields:
-        if field in keys:
-            return entry[field]
+        value = entry.get(field)
+        if value is not None:
+            return value
     return ""
 
 def parse_static_text(static_text, metadata):
@@ -230,6 +1272,12 @@ def parse_static_text(static_text, metadata):
 def replace_assign(match_object, metadata):
     return metadata.get(match_object.group(1), "")
 
+def get_column_range(settings):
+    """Returns the letters of the first and last columns used by a locale's settings."""
+    column_offset = settings["column_offset"]
+    return (get_column_string(1 + column_offset),
+            get_column_string(1 + column_offset + len(settings["columns"]) - 1))
+
 def get_column_string(n):
     """Converts index n to a letter-based column index as is used in Google Sheets."""
     chars = []
@@ -242,93 +1290,359 @@ def get_column_string(n):
 def generate_range_name(sheet, row_start, row_end, column_start, column_end):
     return "{0}!{1}{2}:{3}{4}".format(sheet, column_start, row_start, column_end, row_end)
 
-def update_sheet(service, sheet_id, range_string, body):
-    """Fires a spreadsheet update request through the Google API client."""
-    return service.spreadsheets().values().update(spreadsheetId=sheet_id,
-                                                  range=range_string,
-                                                  body=body,
-                                                  valueInputOption='RAW').execute()
+def batch_by_payload_size(value_ranges, max_bytes, sizes=None):
+    """
+    Splits a list of value ranges into batches whose serialized size stays under `max_bytes`.
+    A single range that exceeds the limit is sent in a batch of its own. The `sizes` of the
+    ranges may be given if they are already known.
+    """
+    if sizes is None: sizes = [len(json.dumps(value_range)) for value_range in value_ranges]
+    batch = []
+    batch_size = 0
+    for value_range, size in zip(value_ranges, sizes):
+        if batch and batch_size + size > max_bytes:
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.append(value_range)
+        batch_size += size
+    if batch:
+        yield batch
+
+def batch_update_sheet(service, sheet_id, value_ranges):
+    """Fires a request that updates several spreadsheet ranges through the Google API client."""
+    body = {'valueInputOption': 'RAW', 'data': value_ranges}
+    request = service.spreadsheets().values().batchUpdate(spreadsheetId=sheet_id, body=body)
+    return get_scheduler().execute(request, "write")
+
+def batch_clear_sheet(service, sheet_id, range_names):
+    """Fires a request that empties several spreadsheet ranges through the Google API client."""
+    body = {'ranges': range_names}
+    request = service.spreadsheets().values().batchClear(spreadsheetId=sheet_id, body=body)
+    return get_scheduler().execute(request, "write")
 
 def handle_pull(service, file_list):
     """
     Updates .po files with data fetched from a Google Sheets spreadsheet.
     """
     info("Mode was set to PULL.")
+    # Every sheet starts from the chunk size it settled on in the last pull
+    chunk_sizes = load_chunk_sizes()
+    tasks = []
 
-    locale_file_paths = {}
-
-    for posix_path in file_list:
-        path_string = str(posix_path)
-        locale = get_locale_by_path(path_string)
-        info("File __{0}__ is from locale __{1}__".format(posix_path, locale))
-        # Path_map associates filenames to full paths
-        path_map = locale_file_paths.get(locale, {})
-        path_map[posix_path.name] = posix_path
-        locale_file_paths[locale] = path_map
-
-    locale_list = locale_file_paths.keys()
-
-    for locale in locale_list:
+    for locale, paths in group_files_by_locale(file_list).items():
         try:
             settings = CONFIG["locales"][locale]
         except KeyError as e:
             warn("Missing configuration for locale {0}, skipping...".format(locale))
             continue
+        # Path_map associates filenames to full paths
+        path_map = {posix_path.name: posix_path for posix_path in paths}
+        tasks.append((locale, path_map, settings, chunk_sizes))
 
-        info("Handling pull for locale {0}.".format(locale))
-        pull_by_locale(service, locale_file_paths[locale], settings)
+    print_summary(run_workers(service, pull_by_locale, tasks))
+    save_chunk_sizes(chunk_sizes)
+    info("__All done!__")
 
-def pull_by_locale(service, file_path_map, settings):
+def pull_by_locale(service, locale, file_path_map, settings, chunk_sizes):
     """
     Pulls data from a sheet that corresponds to a single locale.
+    Returns a summary of the work done.
     """
-    sheet = settings["sheet"]
-    sheet_id = CONFIG["spreadsheet_id"]
-    row_start = 1 + settings["row_offset"] + 1 # Header
+    info("Handling pull for locale {0}.", locale)
     columns = settings["columns"]
-    column_start = get_column_string(1 + settings["column_offset"])
-    column_end = get_column_string(1 + settings["column_offset"] + len(columns) - 1)
     column_mapping = get_column_mapping(columns)
-    chunk_size = CONFIG["pull_chunk_size"]
-    file_name_column = column_mapping["_file_name"]
-    file_name_template = columns[file_name_column]["static"]
-    file_handle_map = {}
-
-    # As we don't know how many rows there are, data is pulled in chunks until there's
-    # nothing else to be read.
-    while True:
-        row_end = row_start + chunk_size - 1
-        range_name = generate_range_name(sheet, row_start, row_end, column_start, column_end)
-        info("Fetching chunk {0}.".format(range_name))
-
-        count, data = fetch_chunk(service, sheet_id, range_name)
-        info("Data: {0}.".format(data))
-
-        if count == 0: break
-
-        process_chunk(file_path_map, file_handle_map, data, column_mapping, file_name_template)
-
-        row_start = row_end + 1
-
-    info("Finished processing. Closing file handles...")
-
-    for file_name, handles in file_handle_map.items():
-        handles["write"].close()
-        handles["read"].close()
-        info("Closed file {0}. Cleaning up...".format(file_name))
+    decode_rows = compile_row_decoder(columns, column_mapping)
+    # The key of each row is stored apart from its other fields, see `CatalogStore`
+    value_columns = [(field, index) for field, index in column_mapping.items()
+                     if field not in ("_file_name", "msgctxt", "msgid")]
+    file_names = {}
+    summary = {"locale": locale, "files": 0, "entries": 0, "rows": 0, "requests": 0}
+
+    # Shards are fetched concurrently, each into its own catalog. A file may span several
+    # shards, so all of them are fetched before any file is touched.
+    shards = get_shards(settings)
+    catalogs = [(locale, "sheet", i) for i in range(len(shards))]
+    # Rows left behind by a pull that failed must not be merged
+    for catalog in catalogs:
+        CATALOG.drop_catalog(catalog)
+    tasks = [(locale, shard, catalog, file_path_map, decode_rows, value_columns, chunk_sizes)
+             for shard, catalog in zip(shards, catalogs)]
+    for shard_file_names, row_count, requests in run_workers(service, fetch_shard_rows, tasks):
+        file_names.update(dict.fromkeys(shard_file_names))
+        summary["rows"] += row_count
+        summary["requests"] += requests
+
+    info("Finished fetching. Merging rows into files...")
+
+    # Rows are already grouped by file in the store, so files are merged one at a time, in
+    # path order, each from start to finish. Only the file being merged is open, and its rows
+    # are freed once it is done, however many files the locale has.
+    for file_name in sorted(file_names, key=lambda name: str(file_path_map[name])):
+        rows = CatalogRows(CATALOG, get_file_catalogs(settings, shards, catalogs, file_name),
+                           file_name)
         full_path = str(file_path_map[file_name])
+        count_file(full_path, rows=len(rows))
+        with measure("parsing", locale, full_path):
+            index = index_po_file(full_path)
+        messages = [] if WRITE_MO else None
+        with measure("rewrite", locale, full_path):
+            changed_entries = merge_po_file(full_path, index, rows, column_mapping, messages)
+        for catalog in catalogs:
+            CATALOG.drop_file(catalog, file_name)
+        if not changed_entries:
+            verbose_info("File {0} is unchanged, skipping...", file_name)
+            continue
+
+        info("Merged {0} changed entries into file {1}. Cleaning up...",
+             changed_entries, file_name)
         full_path_tmp = "{0}.tmp".format(full_path)
         full_path_old = "{0}.old".format(full_path)
+        with measure("rename", locale, full_path):
+            try:
+                os.remove(full_path_old)
+                verbose_info("Removed {0}.", full_path_old)
+            except FileNotFoundError:
+                verbose_info("Old file does not exist, nothing to do.")
+            os.rename(full_path, full_path_old)
+            os.rename(full_path_tmp, full_path)
+        if messages is not None:
+            mo_path = str(Path(full_path).with_suffix(".mo"))
+            with measure("compile", locale, full_path):
+                write_mo_file(mo_path, messages)
+            verbose_info("Compiled {0} messages into {1}.", len(messages), mo_path)
+        summary["files"] += 1
+        summary["entries"] += changed_entries
+
+    for catalog in catalogs:
+        CATALOG.drop_catalog(catalog)
+    return summary
+
+def get_file_catalogs(settings, shards, catalogs, file_name):
+    """
+    Returns the catalogs, one for each shard, that rows of a file are merged from. When
+    sharding by file, rows of a file found in any shard but its own are left over from an
+    older layout, so they are discarded rather than merged over those of its own shard.
+    """
+    if len(shards) == 1 or settings.get("shard_by", "file") != "file":
+        return catalogs
+
+    shard_index = get_file_shard_index(file_name, len(shards))
+    for i, (shard, catalog) in enumerate(zip(shards, catalogs)):
+        if i != shard_index and CATALOG.has_file(catalog, file_name):
+            warn("Rows of file {0} were found in sheet {1}, which does not hold it, "
+                 "discarding them...".format(file_name, shard["sheet"]))
+    return [catalogs[shard_index]]
+
+def fetch_shard_rows(service, locale, settings, catalog, file_path_map, decode_rows,
+                     value_columns, chunk_sizes):
+    """
+    Fetches every row of a sheet holding a locale, or one of its shards, and stores them in
+    `catalog` of the catalog store, as `process_chunk` does. Returns the names of the files
+    that rows were found for, the number of rows and the number of requests.
+
+    The chunk size that the sheet was last pulled with is taken from `chunk_sizes`, and the
+    one that it settles on is stored back in it.
+    """
+    sheet = settings["sheet"]
+    sheet_id = settings["spreadsheet_id"]
+    row_start = 1 + settings["row_offset"] + 1 # Header
+    column_start, column_end = get_column_range(settings)
+    chunk_key = "{0}/{1}".format(sheet_id, sheet)
+    bounds = get_chunk_size_bounds()
+    chunk_size = chunk_sizes.get(chunk_key, CONFIG["pull_chunk_size"])
+    chunk_size = min(bounds[1], max(bounds[0], chunk_size))
+    batch_ranges = CONFIG.get("pull_batch_ranges", DEFAULT_PULL_BATCH_RANGES)
+    file_names = set()
+    fetched_rows = 0
+    # The metadata request is counted up front
+    requests = 1
+
+    # The sheet's dimensions are read first, so that the whole sheet can be fetched in a few
+    # batched requests, each with `batch_ranges` chunks. The size of chunks adapts to how
+    # long requests take and how large their responses are.
+    with measure("api", locale):
+        row_count = get_sheet_row_count(service, sheet_id, sheet)
+    count_request(locale, sheet, row_count, 0)
+
+    chunk_start = row_start
+    while chunk_start <= row_count:
+        batch = []
+        for batch_start in range(chunk_start, row_count + 1, chunk_size)[:batch_ranges]:
+            batch_end = min(batch_start + chunk_size - 1, row_count)
+            batch.append(generate_range_name(sheet, batch_start, batch_end,
+                                             column_start, column_end))
+        info("Fetching chunks {0} through {1}.", batch[0], batch[-1])
+
         try:
-            os.remove(full_path_old)
-            verbose_info("Removed {0}.".format(full_path_old))
-        except FileNotFoundError:
-            verbose_info("Old file does not exist, nothing to do.")
-        os.rename(full_path, full_path_old)
-        os.rename(full_path_tmp, full_path)
+            with measure("api", locale):
+                chunks = fetch_chunks(service, sheet_id, batch)
+        except Exception as e:
+            # Requests that keep timing out may succeed once they ask for fewer rows. Chunks
+            # stay smaller than the ones that failed for the rest of the pull.
+            if (not is_retryable_error(e) or is_rate_limit_error(e)
+                    or chunk_size == bounds[0]): raise
+            bounds = (bounds[0], max(bounds[0], chunk_size // 2)) + bounds[2:]
+            chunk_size = max(bounds[0], chunk_size // 4)
+            warn("Fetching chunks failed ({0}), retrying with {1} rows per chunk...".format(
+                e, chunk_size))
+            continue
+        batch_rows = sum(len(chunk) for chunk in chunks)
+        count_request(locale, batch, chunks, batch_rows)
+        requests += 1
+
+        # Batches that run past the end of the data say little about how full ones fare
+        if batch_rows * 2 >= batch_end - chunk_start + 1:
+            seconds, failures = get_request_stats()
+            payload_bytes = sum(map(len, itertools.chain.from_iterable(
+                itertools.chain.from_iterable(chunks))))
+            next_chunk_size = adapt_chunk_size(chunk_size, seconds, payload_bytes, failures,
+                                               bounds)
+            if next_chunk_size != chunk_size:
+                verbose_info("Chunk size is now {0} rows ({1:.2f}s, {2} bytes).",
+                             next_chunk_size, seconds, payload_bytes)
+        else:
+            next_chunk_size = chunk_size
+
+        for data in chunks:
+            verbose_info("Data: {0}.", data)
+            if not data: continue
+            fetched_rows += len(data)
+            with measure("decoding", locale):
+                file_names.update(process_chunk(file_path_map, catalog, decode_rows(data),
+                                                value_columns))
+        chunk_start = batch_end + 1
+        chunk_size = next_chunk_size
+
+    chunk_sizes[chunk_key] = chunk_size
+    return file_names, fetched_rows, requests
+
+def handle_watch(service, file_list):
+    """
+    Keeps running, pushing .po files as soon as they change, and optionally pulling from the
+    sheet every PULL_INTERVAL seconds. The API client and parsed files stay in memory.
+    """
+    global MEMORY_PARSE_CACHE
+    global FULL_PUSH
+    info("Mode was set to WATCH.")
+    MEMORY_PARSE_CACHE = {}
+    path = CONFIG["path"]
+    watcher = create_watcher(path)
+
+    # Start from an up to date sheet, so that later pushes only send what changes
+    sync_watched_files(handle_push, service, file_list)
+    FULL_PUSH = False
+    next_pull = time.monotonic() + PULL_INTERVAL if PULL_INTERVAL else None
 
-    info("__All done!__")
+    try:
+        while True:
+            timeout = max(0, next_pull - time.monotonic()) if next_pull else None
+            changed_paths = wait_for_changes(watcher, timeout)
+            if changed_paths:
+                sync_watched_files(push_changed_locales, service, changed_paths)
+
+            if next_pull and time.monotonic() >= next_pull:
+                # Files rewritten by the pull are seen as changes, and pushed right away
+                sync_watched_files(handle_pull, service, find_files(path, ".po"))
+                next_pull = time.monotonic() + PULL_INTERVAL
+    except KeyboardInterrupt:
+        info("Stopped watching.")
+
+def push_changed_locales(service, changed_paths):
+    """Pushes every file of the locales in which some file changed."""
+    locales = {get_locale_by_path(str(changed_path)) for changed_path in changed_paths}
+    info("Files changed in locales {0}, pushing...", ", ".join(sorted(locales)))
+    file_list = [posix_path for posix_path in find_files(CONFIG["path"], ".po")
+                 if get_locale_by_path(str(posix_path)) in locales]
+    handle_push(service, file_list)
+
+def sync_watched_files(handler, service, paths):
+    """Runs a push or pull handler, reporting errors instead of stopping the watch."""
+    try:
+        handler(service, paths)
+    except Exception as e:
+        warn("Sync failed, will try again on the next change: {0}".format(e))
 
+def wait_for_changes(watcher, timeout):
+    """
+    Blocks until some .po file changes, or `timeout` seconds pass, and then until DEBOUNCE
+    seconds pass with no further changes. Returns the paths of all files that changed.
+    """
+    changed_paths = watcher.next_changes(timeout)
+    while changed_paths:
+        more_paths = watcher.next_changes(DEBOUNCE)
+        if not more_paths: break
+        changed_paths |= more_paths
+    return changed_paths
+
+def create_watcher(path):
+    """Watches `path` with inotify if the optional `inotify_simple` package is installed."""
+    try:
+        return InotifyWatcher(path)
+    except (ImportError, OSError) as e:
+        verbose_info("Could not use inotify ({0}), polling for changes instead.", e)
+        return PollingWatcher(path)
+
+class InotifyWatcher:
+    """Notices changes to the .po files inside a directory tree through inotify."""
+    def __init__(self, path):
+        from inotify_simple import INotify, flags
+        self.flags = flags
+        self.mask = (flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.CREATE |
+                     flags.DELETE)
+        self.inotify = INotify()
+        self.directories = {}
+        for directory, _, _ in os.walk(path):
+            self.add_directory(directory)
+
+    def add_directory(self, directory):
+        self.directories[self.inotify.add_watch(directory, self.mask)] = directory
+
+    def next_changes(self, timeout):
+        """Waits up to `timeout` seconds, or forever if None, for changes."""
+        events = self.inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+        changed_paths = set()
+        for event in events:
+            directory = self.directories.get(event.wd)
+            if directory is None: continue
+            changed_path = Path(directory) / event.name
+            if event.mask & self.flags.ISDIR:
+                if event.mask & (self.flags.CREATE | self.flags.MOVED_TO):
+                    for new_directory, _, _ in os.walk(str(changed_path)):
+                        self.add_directory(new_directory)
+            elif changed_path.suffix.lower() == ".po":
+                changed_paths.add(changed_path)
+        return changed_paths
+
+class PollingWatcher:
+    """Notices changes to the .po files inside a directory tree by checking their stamps."""
+    def __init__(self, path):
+        self.path = path
+        self.stamps = self.get_stamps()
+
+    def get_stamps(self):
+        stamps = {}
+        for posix_path in find_files(self.path, ".po"):
+            try:
+                stamps[posix_path] = get_file_stamp(str(posix_path))
+            except FileNotFoundError:
+                continue
+        return stamps
+
+    def next_changes(self, timeout):
+        """Waits up to `timeout` seconds, or forever if None, for changes."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            stamps = self.get_stamps()
+            changed_paths = {posix_path for posix_path in stamps.keys() | self.stamps.keys()
+                             if stamps.get(posix_path) != self.stamps.get(posix_path)}
+            self.stamps = stamps
+            if changed_paths: return changed_paths
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0: return set()
+            time.sleep(WATCH_POLL_INTERVAL if remaining is None
+                       else min(WATCH_POLL_INTERVAL, remaining))
 
 def get_column_mapping(columns):
     """
@@ -357,173 +1671,629 @@ def get_column_mapping(columns):
                                    'e.g.: {"static": "{file_name}", "header": "FILE NAME"}'))
     return ret
 
-def fetch_chunk(service, spreadsheet_id, range_name):
-    """Fires a spreadsheet retrieval request through the Google API client."""
-    result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id,
-                                                 range=range_name).execute()
-    values = result.get('values')
-    row_count = len(values) if values is not None else 0
-    info('{0} rows retrieved.'.format(row_count))
-    return row_count, values
+def get_sheet_row_count(service, spreadsheet_id, sheet):
+    """Fires a spreadsheet metadata request to find out how many rows a sheet's grid has."""
+    request = service.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=[sheet],
+                                         fields='sheets.properties.gridProperties.rowCount')
+    result = get_scheduler().execute(request, "read", key=("get", spreadsheet_id, sheet))
+    try:
+        return result['sheets'][0]['properties']['gridProperties']['rowCount']
+    except (KeyError, IndexError):
+        error("Could not read the dimensions of sheet {0}.".format(sheet))
+
+def get_chunk_size_bounds():
+    """
+    Returns the smallest and largest chunk sizes that pull may use, and the time and payload
+    size that its requests aim for.
+    """
+    minimum = CONFIG.get("pull_chunk_size_min", DEFAULT_PULL_CHUNK_SIZE_MIN)
+    maximum = CONFIG.get("pull_chunk_size_max", DEFAULT_PULL_CHUNK_SIZE_MAX)
+    if not 0 < minimum <= maximum:
+        error("pull_chunk_size_min must be positive and no larger than pull_chunk_size_max.")
+    return (minimum, maximum,
+            CONFIG.get("pull_target_seconds", DEFAULT_PULL_TARGET_SECONDS),
+            CONFIG.get("pull_target_bytes", DEFAULT_PULL_TARGET_BYTES))
+
+def adapt_chunk_size(chunk_size, seconds, payload_bytes, failures, bounds):
+    """
+    Picks the chunk size for the next request of a pull, given how the last one went.
+    Chunks are halved after timeouts or server errors, shrunk in proportion when requests
+    take longer or return more than aimed for, and grown, at most twice as large at a time,
+    when requests are well within both targets.
 
-def process_chunk(file_path_map, file_handle_map, data, column_mapping, file_name_template):
+    Parameters:
+    seconds - How long the last request took, not counting waits for quota
+    payload_bytes - Approximate size of its response
+    failures - How many times it failed before succeeding, not counting rate limiting
+    bounds - The limits and targets returned by `get_chunk_size_bounds`
+    """
+    minimum, maximum, target_seconds, target_bytes = bounds
+    if failures:
+        chunk_size //= 2
+    else:
+        scale = min(target_seconds / max(seconds, 0.001), target_bytes / max(payload_bytes, 1))
+        # Requests somewhat under their targets are left alone, so that sizes settle
+        if scale < 1 or scale >= 1.5:
+            chunk_size = int(chunk_size * min(2, scale))
+    return min(maximum, max(minimum, chunk_size))
+
+def load_chunk_sizes():
+    """Reads the chunk size that each sheet was last pulled with, keyed by spreadsheet and sheet."""
+    return load_state_file(CHUNK_SIZES_FILE)
+
+def save_chunk_sizes(chunk_sizes):
+    """Persists the chunk sizes that sheets were pulled with, for later pulls to start from."""
+    save_state_file(CHUNK_SIZES_FILE, chunk_sizes)
+
+def fetch_chunks(service, spreadsheet_id, range_names):
+    """
+    Fires a single retrieval request for several ranges through the Google API client.
+    Returns the rows of each range, in the same order as `range_names`.
+    """
+    request = service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id,
+                                                       ranges=range_names)
+    result = get_scheduler().execute(request, "read",
+                                     key=("batchGet", spreadsheet_id, tuple(range_names)))
+    chunks = [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+    info('{0} rows retrieved.', sum(len(chunk) for chunk in chunks))
+    return chunks
+
+def process_chunk(file_path_map, catalog, records, value_columns):
     """
-    Translates `data` row by row into updates to a PO file.
+    Stores decoded rows in `catalog` of the catalog store, grouped by the file they belong to
+    and keyed by (msgctxt, msgid). Returns the names of those files.
 
     Parameters:
     file_path_map - Given a file's name, points to its full path
-    file_handle_map - Contains a read handle and a write handle for each file
-    data - The rows obtained from the spreadsheet
-    column_mapping - The column index that stores each field
-    file_name_template - The value for `static` in `config.json` for the column that contains
-                         the file name. Used to extract the file name.
+    catalog - Name of the catalog in the store
+    records - The (file name, key, row) tuples returned by a row decoder
+    value_columns - (field, column index) pairs of the fields kept for each row
+    """
+    fields = [field for field, _ in value_columns]
+    indices = [index for _, index in value_columns]
+    entries = []
+    for file_name, key, row in records:
+        if file_name not in file_path_map:
+            warn("File {0} does not exist locally, discarding row...".format(file_name))
+            continue
+        # Sheets omits trailing empty cells
+        length = len(row)
+        entries.append((file_name, key, [row[index] if index < length else ""
+                                         for index in indices]))
+    CATALOG.add_entries(catalog, fields, entries)
+    return {file_name for file_name, _, _ in entries}
+
+def compile_row_decoder(columns, column_mapping):
+    """
+    Prepares, once per locale, everything needed to decode rows fetched from its sheet.
+
+    Returns a function that turns a chunk of rows into a list of (file name, key, row) tuples,
+    skipping empty rows, where the key is (msgctxt, msgid). If no column holds `msgctxt`,
+    the context part of the key is None.
     """
     file_name_column = column_mapping["_file_name"]
+    file_name_template = columns[file_name_column]["static"]
+    # The common case of a column with just the file name needs no regex at all
+    file_name_pattern = None
+    if file_name_template != "{file_name}":
+        file_name_pattern = compile_template(file_name_template)
     msgid_column = column_mapping["msgid"]
-    for row in data:
-        if any(row):
-            assigns = extract_string_assigns(file_name_template, row[file_name_column])
-            verbose_info("Extracted assigns: {0}.".format(assigns))
-            base_filename = assigns["file_name"]
-            target_file = file_path_map[base_filename]
-            info("Target file is {0}.".format(target_file))
-
-            if base_filename not in file_handle_map.keys():
-                verbose_info("Opening read and write file handles...")
-                file_handle_map[base_filename] = open_handle_pair(str(target_file))
-
-            handles = file_handle_map[base_filename]
-
-            buffered_lines = find_msgid_in_file(handles["read"], row[msgid_column])
-            write_buffered_lines_to_file(handles["write"], buffered_lines)
-            write_updated_entry_to_file(handles, row, column_mapping)
-    return False
-
-def extract_string_assigns(template, string):
+    msgctxt_column = column_mapping.get("msgctxt")
+
+    def decode_rows(data):
+        records = []
+        for row in data:
+            if not any(row): continue
+            # Sheets omits trailing empty cells
+            length = len(row)
+            file_name = row[file_name_column] if file_name_column < length else ""
+            if file_name_pattern is not None:
+                match = file_name_pattern.search(file_name)
+                if match is None:
+                    warn("Could not find a file name in {0}, discarding row...".format(row))
+                    continue
+                file_name = match.group("file_name")
+            msgid = row[msgid_column] if msgid_column < length else ""
+            msgctxt = None
+            if msgctxt_column is not None and msgctxt_column < length:
+                msgctxt = row[msgctxt_column] or None
+            records.append((file_name, (msgctxt, msgid), row))
+        return records
+
+    return decode_rows
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template):
     """
-    Given a template and a string, extract a map containing named assigns.
-    e.g.: template: "{x} world!"
-          string: "Hello world!"
-          return: {"x": "Hello"}
+    Compiles a `static` template into a regex that extracts its assigns as named groups.
+    e.g.: template: "File: {file_name}"
+          regex: "File:\\ (?P<file_name>.*)"
     """
     escaped = re.escape(template)
-    reverse_template = RE_ESCAPED_ASSIGN.sub('(?P<\\1>.*)', escaped)
-    result_iterator = re.finditer(reverse_template, string)
-    # Builds a dict out of named captures in a regex
-    return next(result_iterator).groupdict()
-
-def open_handle_pair(target_file):
-    """
-    Opens an existing .po file for reading and a new .po.tmp file for writing, copying the
-    header's contents of the original file to it.
-    """
-    new_file = "{0}.tmp".format(target_file)
-    handle_map = {"read": open(target_file, "r"), "write": open(new_file, "w")}
-    # Header handling
-    buffered_lines = find_msgid_in_file(handle_map["read"], "")
-    write_buffered_lines_to_file(handle_map["write"], buffered_lines)
-    write_updated_entry_to_file(handle_map)
-    return handle_map
-
-def find_msgid_in_file(file_handle, msgid):
-    """
-    Moves the file read pointer in `file_handle` to the entry's first line.
-    Returns a list of all lines after the previous entry in the file.
-    """
-    wrapped = False
-    buffered_lines = []
-    pre_entry_position = 0
-    reading_an_entry = False
-    info("Looking for msgid __'{0}'__.".format(msgid))
-    while True:
-        beginning_of_line = file_handle.tell()
-        line = file_handle.readline()
-
-        # Wrap around the file once on EOF.
-        if not line:
-            if not wrapped:
-                info("EOF reached, restarting from beginning of file...")
-                wrapped = True
-                buffered_lines = []
-                pre_entry_position = 0
-                reading_an_entry = False
-                file_handle.seek(0)
-            else:
-                error("Msgid {0} was not found in the file.".format(msgid))
+    return re.compile(RE_ESCAPED_ASSIGN.sub('(?P<\\1>.*)', escaped))
 
-        match = RE_ENTRY_FIELD.match(line)
-        if match:
-            if not reading_an_entry:
-                reading_an_entry = True
-                pre_entry_position = beginning_of_line
-            field = match.group(1)
-            value = match.group(2)
+def index_po_file(path):
+    """
+    Builds an offset index for all entries in a .po file in a single sequential read.
 
-            if field == 'msgid' and value == msgid:
-                file_handle.seek(pre_entry_position)
-                info("Successfully found! Entry begins at position __{0}__.".format(file_handle.tell()))
-                return buffered_lines
-        else:
-            # Line does not contain a 'msg*' field. (e.g. comments or metadata)
-            # These are buffered so that they can be returned later.
-            if reading_an_entry:
-                reading_an_entry = False
-                buffered_lines = []
-            # Do not buffer precedent lines containing pure strings,
-            # e.g. header fields such as "Language: en\n"
-            if not RE_EXTRA_STRING.match(line):
-                buffered_lines.append(line)
+    Returns a dict, in file order, whose keys are (msgctxt, msgid) tuples and whose values
+    are (start, end) byte offsets delimiting the entry's "msg*" lines and their continuation
+    strings. Comments and blank lines preceding an entry are not part of its span.
 
-def write_buffered_lines_to_file(file_handle, buffered_lines):
+    The index is stored in the parse cache, and read from it while the file is unchanged.
+    """
+    stamp = get_file_stamp(path)
+    index = read_parse_cache(path, "index", stamp)
+    if index is not None:
+        verbose_info("Using cached index for {0}.", path)
+        return index
+
+    index = {}
+
+    with open(path, "rb") as file:
+        for start, end, fields in scan_po_file(file):
+            key = (fields.get("msgctxt"), fields.get("msgid"))
+            if key in index:
+                warn("Duplicate entry {0} found in {1}, keeping the first one.".format(key, path))
+                continue
+            index[key] = (start, end)
+
+    write_parse_cache(path, "index", stamp, index)
+    return index
+
+def get_file_stamp(path):
     """
-    Write all lines that precede an entry to the write file's current pointer.
-    These usually include comments and blank lines.
+    Returns a string that changes whenever the file at `path` is modified or replaced.
+    It must be taken before reading the file, so that changes made while reading are noticed.
     """
-    verbose_info("Buffered lines to be written: {0}".format(buffered_lines))
-    for line in buffered_lines:
-        file_handle.write(line)
+    stat = os.stat(path)
+    return "{0}:{1}:{2}".format(stat.st_size, stat.st_mtime_ns, stat.st_ino)
 
-def write_updated_entry_to_file(handles, row=None, column_mapping=None):
+def caches_parsed_entries(path):
     """
-    Reads sequential "msg*" fields from the file given by `handles`, and outputs them
-    with updated values from the `row` data, mapped by `column_mapping`.
+    Tells whether the entries parsed from the file at `path` are to be cached, which means
+    holding all of them until the file is read. Files larger than
+    `parse_cache_max_file_bytes` are streamed instead, unless watch mode keeps every file in
+    memory anyway.
+    """
+    if MEMORY_PARSE_CACHE is not None: return True
+    max_file_bytes = CONFIG.get("parse_cache_max_file_bytes", DEFAULT_PARSE_CACHE_MAX_FILE_BYTES)
+    return stored_parse_cache_enabled() and os.path.getsize(path) <= max_file_bytes
+
+def stored_parse_cache_enabled():
+    return CONFIG.get("parse_cache_bytes", DEFAULT_PARSE_CACHE_BYTES) > 0
+
+def get_parse_cache():
+    """Opens the parse cache database, creating it if needed. Must be called with PARSE_CACHE_LOCK."""
+    global PARSE_CACHE
+    if PARSE_CACHE is None:
+        # Processes of the parse pool share the cache, and may wait on each other's writes
+        PARSE_CACHE = sqlite3.connect(PARSE_CACHE_FILE, check_same_thread=False, timeout=30)
+        # Losing the cache is harmless, so there is no need to wait for the disk
+        PARSE_CACHE.execute("PRAGMA synchronous = OFF")
+        PARSE_CACHE.execute("CREATE TABLE IF NOT EXISTS parsed ("
+                            "path TEXT, kind TEXT, stamp TEXT, size INTEGER, accessed REAL, "
+                            "data BLOB, PRIMARY KEY (path, kind))")
+    return PARSE_CACHE
+
+def read_parse_cache(path, kind, stamp):
+    """
+    Returns the value of `kind` ("entries" or "index") cached for the file at `path`,
+    or None if caching is disabled or the file's stamp does not match the cached one.
+    """
+    path = os.path.abspath(path)
+    if MEMORY_PARSE_CACHE is not None:
+        cached = MEMORY_PARSE_CACHE.get((path, kind))
+        if cached is not None and cached[0] == stamp:
+            # Entries themselves are kept in the catalog store
+            if kind == "entries": return CATALOG.get_file_entries(*get_po_catalog(path))
+            return cached[1]
+    if not stored_parse_cache_enabled(): return None
+
+    with PARSE_CACHE_LOCK:
+        cache = get_parse_cache()
+        result = cache.execute("SELECT data FROM parsed WHERE path = ? AND kind = ? AND stamp = ?",
+                               (path, kind, stamp)).fetchone()
+        if result is None: return None
+        cache.execute("UPDATE parsed SET accessed = ? WHERE path = ? AND kind = ?",
+                      (time.time(), path, kind))
+        cache.commit()
+
+    value = pickle.loads(result[0])
+    # In watch mode, the file is then kept in memory like one that was just parsed
+    if MEMORY_PARSE_CACHE is not None: remember_parsed(path, kind, stamp, value)
+    return value
+
+def write_parse_cache(path, kind, stamp, value):
+    """
+    Stores the value of `kind` ("entries" or "index") for the file at `path`.
+    Least recently used values are evicted while the cache is over its size limit.
+    """
+    path = os.path.abspath(path)
+    if MEMORY_PARSE_CACHE is not None: remember_parsed(path, kind, stamp, value)
+    if not stored_parse_cache_enabled(): return
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    max_bytes = CONFIG.get("parse_cache_bytes", DEFAULT_PARSE_CACHE_BYTES)
+
+    with PARSE_CACHE_LOCK:
+        cache = get_parse_cache()
+        cache.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?, ?, ?)",
+                      (path, kind, stamp, len(data), time.time(), data))
+        total = cache.execute("SELECT SUM(size) FROM parsed").fetchone()[0]
+        if total > max_bytes:
+            evicted = cache.execute("SELECT path, kind, size FROM parsed "
+                                    "ORDER BY accessed").fetchall()
+            for evicted_path, evicted_kind, size in evicted:
+                if total <= max_bytes: break
+                cache.execute("DELETE FROM parsed WHERE path = ? AND kind = ?",
+                              (evicted_path, evicted_kind))
+                total -= size
+        cache.commit()
+
+def remember_parsed(path, kind, stamp, value):
+    """Keeps the value of `kind` for the file at `path` in memory, for watch mode."""
+    if kind == "entries":
+        store_parsed_entries(path, value)
+        MEMORY_PARSE_CACHE[(path, kind)] = (stamp, None)
+    else:
+        MEMORY_PARSE_CACHE[(path, kind)] = (stamp, value)
+
+def store_parsed_entries(path, parsed):
+    """Keeps the entries parsed from a .po file in the catalog store, replacing older ones."""
+    catalog, file_name = get_po_catalog(path)
+    parsed = [dict(fields) for fields in parsed]
+    field_names = {field for fields in parsed for field in fields} - {"msgctxt", "msgid"}
+    entries = [(file_name, (fields.get("msgctxt"), fields.get("msgid", "")),
+                [fields.get(field) for field in field_names]) for fields in parsed]
+    CATALOG.drop_file(catalog, file_name)
+    CATALOG.add_entries(catalog, list(field_names), entries)
+
+def get_po_catalog(path):
+    """
+    Returns the catalog that holds the entries of a .po file in the catalog store, which is
+    the same for every file in a directory, along with the file's name.
+    """
+    directory, file_name = os.path.split(path)
+    return ("po", directory), file_name
 
-    This function expects that the pointer in both handles is at the start of an entry.
+def merge_po_file(path, index, rows, column_mapping, messages=None):
     """
-    read_handle = handles["read"]
-    write_handle = handles["write"]
+    Merges `rows`, which maps (msgctxt, msgid) keys to fetched rows as `CatalogRows` does,
+    into the .po file at `path`.
 
-    while True:
-        beginning_of_line = read_handle.tell()
-        line = read_handle.readline()
+    Using the file's `index`, built by `index_po_file`, every entry with a matching row is
+    compared against it. Without a msgctxt column, entries that only differ in context share
+    a key, and the n-th row with that key is matched to the n-th of them, in file order.
+    Only if some entry changed is `<path>.tmp` written, by copying the original file in one
+    sequential pass and replacing the changed entries. Returns the number of changed entries.
 
-        match = RE_ENTRY_FIELD.match(line)
-        can_update = (column_mapping is not None)
-        if not match:
-            # Preserve lines containing pure strings,
-            # e.g. header fields such as "Language: en\n"
-            extra_match = RE_EXTRA_STRING.match(line)
-            can_update = False
-            if not extra_match:
-                verbose_info("Line '{0}' did not match any field. Stopping update...".format(line))
-                read_handle.seek(beginning_of_line)
-                break
+    If `messages` is a list and the file changed, the messages of the merged file are also
+    collected into it during that pass, as pairs for `write_mo_file`.
+    """
+    has_context = "msgctxt" in column_mapping
+    # Number of entries found for each row key so far
+    occurrences = {}
+    replacements = []
+
+    with open(path, "rb") as read_handle:
+        for key, (start, end) in index.items():
+            # The header (empty msgid) is always kept as is
+            if key == (None, ""): continue
+            row_key = key if has_context else (None, key[1])
+            occurrence = occurrences.get(row_key, 0)
+            occurrences[row_key] = occurrence + 1
+            row = rows.get(row_key, occurrence)
+            if row is None: continue
+
+            read_handle.seek(start)
+            entry = read_handle.read(end - start)
+            if not entry_differs(entry, row, column_mapping): continue
+            new_entry = rewrite_entry(entry.decode("utf-8"), row, column_mapping).encode("utf-8")
+            replacements.append((start, end, new_entry))
+
+        if replacements:
+            read_handle.seek(0)
+            try:
+                with open("{0}.tmp".format(path), "wb") as write_handle:
+                    if messages is None:
+                        copy_with_replacements(read_handle, write_handle, replacements)
+                    else:
+                        copy_and_collect_messages(read_handle, write_handle, index,
+                                                  replacements, messages)
+            except BaseException:
+                # Do not leave a partial copy behind
+                os.remove("{0}.tmp".format(path))
+                raise
+
+    for key in rows.keys():
+        entry_count = occurrences.get(key, 0)
+        if not entry_count:
+            warn("Msgid {0} was not found in file {1}, discarding row...".format(key, path))
+            continue
+        row_count = rows.count(key)
+        if row_count > entry_count:
+            warn("Msgid {0} has {1} rows but {2} entries in file {3}, discarding the last "
+                 "{4} rows...".format(key, row_count, entry_count, path, row_count - entry_count))
+
+    return len(replacements)
+
+def copy_with_replacements(read_handle, write_handle, replacements):
+    """Copies a file, writing the new entries in `replacements` over the spans they replace."""
+    position = 0
+    for start, end, new_entry in replacements:
+        write_handle.write(read_handle.read(start - position))
+        write_handle.write(new_entry)
+        read_handle.seek(end)
+        position = end
+    shutil.copyfileobj(read_handle, write_handle)
+
+def copy_and_collect_messages(read_handle, write_handle, index, replacements, messages):
+    """
+    Same as `copy_with_replacements`, but copies the file one entry at a time, so that the
+    message of every entry in `index` can be appended to `messages` along the way.
+    Fuzzy entries are left out, except for the header, and so are untranslated ones.
+    """
+    new_entries = {start: new_entry for start, _, new_entry in replacements}
+    position = 0
+    for start, end in index.values():
+        comments = read_handle.read(start - position)
+        entry = read_handle.read(end - start)
+        entry = new_entries.get(start, entry)
+        write_handle.write(comments)
+        write_handle.write(entry)
+        position = end
+
+        _, _, fields = next(scan_po_file(entry.splitlines(keepends=True)))
+        message = get_mo_message(fields)
+        is_header = message[0] == b""
+        if message[1] and (is_header or not is_fuzzy(comments)):
+            messages.append(message)
+    shutil.copyfileobj(read_handle, write_handle)
+
+def is_fuzzy(comments):
+    """Tells whether the comments right above an entry, given as bytes, flag it as fuzzy."""
+    for line in reversed(comments.splitlines()):
+        line = line.strip()
+        if not line.startswith(b"#"):
+            # Blank lines may separate an entry from its comments, but nothing else may
+            if line: break
+            continue
+        if line.startswith(b"#,") and b"fuzzy" in line: return True
+    return False
+
+def get_mo_message(fields):
+    """
+    Converts the fields of an entry to a (key, translation) pair, as bytes, the way they are
+    stored in a .mo file. The key is `msgctxt\x04msgid`, followed by `\0msgid_plural` for plural
+    entries, whose translations are joined by `\0` as well. Untranslated entries get an empty
+    translation.
+    """
+    key = unescape_po_string(fields.get("msgid", ""))
+    if "msgctxt" in fields:
+        key = "{0}\x04{1}".format(unescape_po_string(fields["msgctxt"]), key)
+    if "msgid_plural" in fields:
+        key = "{0}\0{1}".format(key, unescape_po_string(fields["msgid_plural"]))
+        translations = [unescape_po_string(value) for field, value in sorted(
+            ((field, value) for field, value in fields.items() if field.startswith("msgstr[")),
+            key=lambda item: int(item[0][7:-1]))]
+        translation = "\0".join(translations) if any(translations) else ""
+    else:
+        translation = unescape_po_string(fields.get("msgstr", ""))
+    return key.encode("utf-8"), translation.encode("utf-8")
+
+def unescape_po_string(value):
+    """Turns the contents of a quoted .po string into the text it stands for."""
+    if "\\" not in value: return value
+    return RE_PO_ESCAPE.sub(replace_po_escape, value)
+
+def replace_po_escape(match):
+    escape = match.group(1)
+    if escape[0] == "x": return chr(int(escape[1:], 16))
+    if escape[0].isdigit(): return chr(int(escape, 8))
+    return PO_ESCAPES.get(escape, escape)
+
+def write_mo_file(path, messages):
+    """
+    Writes `messages`, a list of (key, translation) pairs as returned by `get_mo_message`,
+    to a GNU .mo file at `path`, including the hash table used to look messages up.
+    The file is written under a temporary name first, and then moved into place.
+    """
+    messages = sorted(dict(messages).items())
+    count = len(messages)
+    hash_size = get_mo_hash_size(count)
+    keys_offset = 7 * 4
+    translations_offset = keys_offset + count * 8
+    hash_offset = translations_offset + count * 8
+    data_offset = hash_offset + hash_size * 4
+
+    key_table = []
+    translation_table = []
+    data = bytearray()
+    for strings, table in (([key for key, _ in messages], key_table),
+                           ([translation for _, translation in messages], translation_table)):
+        for string in strings:
+            table += [len(string), data_offset + len(data)]
+            data += string + b"\0"
+
+    hash_table = [0] * hash_size
+    for i, (key, _) in enumerate(messages):
+        # Like libintl, which looks messages up by msgid alone, plural keys are only hashed
+        # up to the NUL before their msgid_plural
+        hash_value = hash_mo_key(key.split(b"\0", 1)[0])
+        bucket = hash_value % hash_size
+        step = 1 + hash_value % (hash_size - 2)
+        while hash_table[bucket]:
+            bucket = (bucket + step) % hash_size
+        hash_table[bucket] = i + 1
+
+    header = [MO_MAGIC, 0, count, keys_offset, translations_offset, hash_size, hash_offset]
+    tmp_path = "{0}.tmp".format(path)
+    with open(tmp_path, "wb") as file:
+        file.write(array("I", header + key_table + translation_table + hash_table).tobytes())
+        file.write(data)
+    os.replace(tmp_path, path)
+
+def get_mo_hash_size(count):
+    """Sizes the hash table the way msgfmt does: the smallest prime above 4/3 of the count."""
+    size = max(3, count * 4 // 3) | 1
+    while any(size % divisor == 0 for divisor in range(3, int(size ** 0.5) + 1, 2)):
+        size += 2
+    return size
+
+def hash_mo_key(key):
+    """The hashpjw function, which gettext uses for the hash table of .mo files."""
+    hash_value = 0
+    for byte in key:
+        hash_value = ((hash_value << 4) + byte) & 0xffffffff
+        high_bits = hash_value & 0xf0000000
+        if high_bits:
+            hash_value ^= high_bits >> 24
+            hash_value ^= high_bits
+    return hash_value
+
+def entry_differs(entry, row, column_mapping):
+    """
+    Tells whether any field of `entry`, given as bytes, that has a column differs from its
+    value in `row`.
+    """
+    _, _, fields = next(scan_po_file(entry.splitlines(keepends=True)))
+    return any(value != row.get(field, "")
+               for field, value in fields.items() if field in column_mapping)
 
-        if can_update:
+def rewrite_entry(entry, row, column_mapping):
+    """
+    Outputs the "msg*" lines of `entry` with updated values from the fetched `row`, for the
+    fields in `column_mapping`. Fields without a column, and their continuation strings, are
+    kept as is.
+    """
+    output = []
+    replacing = False
+
+    for line in entry.splitlines(keepends=True):
+        match = RE_ENTRY_FIELD.match(line.strip())
+        if match:
             field = match.group(1)
-            verbose_info("Updating field {0}...".format(field))
-            new_value = row[column_mapping[field]]
-            write_handle.write('{0} "{1}"\n'.format(field, new_value))
-        else:
-            verbose_info("Copying line {0}...".format(line))
-            write_handle.write(line)
+            replacing = field in column_mapping
+            if replacing:
+                verbose_info("Updating field {0}...", field)
+                new_value = row.get(field, "")
+                output.append('{0} "{1}"\n'.format(field, new_value))
+                continue
+        # Continuation strings of a replaced field are dropped
+        elif replacing:
+            continue
+        output.append(line)
+
+    return "".join(output)
 
-def verbose_info(string):
-    if VERBOSE: info(string)
+def new_metrics():
+    """
+    Creates the structure in which metrics are collected. Timings, in seconds, are kept per
+    stage in "stages", and other counts in "counts", both for the whole run and for each
+    locale and file.
+    """
+    return {"stages": {}, "counts": {}, "locales": {}, "files": {}}
+
+def get_metric_scopes(locale, file):
+    """Returns the parts of METRICS that a measurement for `locale` and `file` applies to."""
+    scopes = [METRICS]
+    if locale is not None:
+        scopes.append(METRICS["locales"].setdefault(locale, {"stages": {}, "counts": {}}))
+    if file is not None:
+        scopes.append(METRICS["files"].setdefault(str(file), {"stages": {}, "counts": {}}))
+    return scopes
+
+@contextlib.contextmanager
+def measure(stage, locale=None, file=None):
+    """
+    Adds the time spent in the block to `stage`, for the run and the given locale and file.
+    Time spent in a nested block is only counted for the innermost stage.
+    Does nothing if metrics are not being collected.
+    """
+    if METRICS is None:
+        yield
+        return
+
+    if not hasattr(THREAD_STATE, "metric_stack"): THREAD_STATE.metric_stack = []
+    stack = THREAD_STATE.metric_stack
+    # Each level of the stack accumulates the time spent in the levels nested in it
+    stack.append(0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack: stack[-1] += elapsed
+        with METRICS_LOCK:
+            for scope in get_metric_scopes(locale, file):
+                scope["stages"][stage] = scope["stages"].get(stage, 0) + elapsed - nested
+
+def measure_iter(iterable, stage, locale=None, file=None):
+    """
+    Yields the items of `iterable`, adding the time spent producing each one to `stage`.
+    Useful for generators, whose work is interleaved with that of their consumer.
+    """
+    if METRICS is None:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    while True:
+        with measure(stage, locale, file):
+            item = next(iterator, StopIteration)
+        if item is StopIteration: return
+        yield item
+
+def count(locale=None, file=None, **counts):
+    """Adds `counts`, such as requests or rows, to the run and the given locale and file."""
+    if METRICS is None: return
+    with METRICS_LOCK:
+        for scope in get_metric_scopes(locale, file):
+            for key, value in counts.items():
+                scope["counts"][key] = scope["counts"].get(key, 0) + value
+
+def count_file(file, **counts):
+    """Adds `counts` to the given file only, e.g. the rows built from or merged into it."""
+    if METRICS is None: return
+    with METRICS_LOCK:
+        scope = get_metric_scopes(None, file)[-1]
+        for key, value in counts.items():
+            scope["counts"][key] = scope["counts"].get(key, 0) + value
+
+def count_request(locale, request_body, response, rows):
+    """Counts a request to the Sheets API, along with the size of its payloads."""
+    if METRICS is None: return
+    count(locale, requests=1, rows=rows,
+          request_bytes=len(json.dumps(request_body)), response_bytes=len(json.dumps(response)))
+
+def write_metrics(path, total_seconds):
+    """Writes the collected metrics to `path` as JSON, adding rows per second to every scope."""
+    scopes = [METRICS] + list(METRICS["locales"].values()) + list(METRICS["files"].values())
+    for scope in scopes:
+        seconds = sum(scope["stages"].values())
+        rows = scope["counts"].get("rows", 0)
+        scope["rows_per_second"] = rows / seconds if seconds and rows else 0
+
+    metrics = {"mode": MODE.name.lower(), "jobs": JOBS, "total_seconds": total_seconds}
+    metrics.update(METRICS)
+    with open(path, "w") as file:
+        json.dump(metrics, file, indent=2)
+
+def verbose_info(string, *args):
+    if VERBOSE: info(string, *args)
+
+def info(string, *args):
+    """
+    Prints a message, highlighting text between double underscores. The message is only
+    formatted with `args` if it is going to be printed.
+    """
+    if QUIET: return
+    if args: string = string.format(*args)
+    print(highlight(string))
 
-def info(string):
-    parsed = RE_HIGHLIGHT.sub('{0}\\1{1}'.format(C_BLUE, C_RESET), string)
-    print(parsed)
+def highlight(string):
+    return RE_HIGHLIGHT.sub('{0}\\1{1}'.format(C_BLUE, C_RESET), string)
 
 def warn(string):
     print(C_YELLOW + string + C_RESET)